@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Martin Thurau <martin.thurau@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+from collections import defaultdict
+
+from odf.opendocument import load
+from odf import table
+from planparser import fill_meal_table
+from sudokufiller import generate_many, fill_sudoku_table, sudoku_key, SOLUTION_PREFIX, DIFFICULTY, \
+	SudokufillerException
+
+import logging
+log = logging.getLogger('mensaplan.batch')
+
+def generate_sudokus(difficulties, workers=None):
+	'''Erzeugt Sudokus für die gegebenen Schwierigkeitsgrade parallel in mehreren
+	Prozessen (siehe generate_many). Die Sudokus werden in der Reihenfolge der
+	Schwierigkeitsgrade zurückgegeben: ein Sudoku wird ausgegeben, sobald eines
+	mit dem als nächstes benötigten Schwierigkeitsgrad fertig ist.
+
+	Parameter:
+		difficulties	eine Liste mit Schwierigkeitsgraden
+		workers			(optional) die Anzahl der Prozesse (Standard: Anzahl der CPUs)
+
+	Rückgabe:			ein Generator mit MySudoku-Objekten'''
+	finished = defaultdict(list)
+	sudokus = generate_many(difficulties, workers)
+	try:
+		for difficulty in difficulties:
+			while not finished[difficulty]:
+				s = sudokus.next()
+				finished[s.difficulty].append(s)
+			yield finished[difficulty].pop(0)
+	finally:
+		sudokus.close()
+
+def fill_document_sudokus(doc, sudokus):
+	'''Füllt alle "Sudoku*" und "Solution*" Tabellen eines Dokuments. Tabellen mit
+	demselben Suffix bekommen dasselbe Sudoku.
+
+	Parameter:
+		doc				das ODT Dokument
+		sudokus			ein Iterator der MySudoku-Objekte liefert
+
+	Rückgabe:			ein dict mit den verwendeten Sudokus (Suffix -> MySudoku)'''
+	used = {}
+	for t in doc.getElementsByType(table.Table):
+		table_name = t.getAttribute("name")
+		key = sudoku_key(table_name)
+		if key is None:
+			continue
+		if key not in used:
+			used[key] = sudokus.next()
+		if table_name.startswith(SOLUTION_PREFIX):
+			fill_sudoku_table(t, used[key].solution)
+		else:
+			fill_sudoku_table(t, used[key].sudoku)
+	return used
+
+def create_batch(template, days, filenames, difficulty=DIFFICULTY, workers=None):
+	'''Erzeugt mehrere Mensapläne mit demselben Speiseplan aber unterschiedlichen
+	Sudokus, z.B. zum Aushängen in mehreren Gebäuden. Die Vorlage wird nur einmal
+	geladen und der Mensaplan nur einmal gefüllt, für jede Datei wird dann eine
+	Kopie des Dokuments mit eigenen Sudokus gespeichert. Die Sudokus werden
+	währenddessen parallel erzeugt.
+
+	Parameter:
+		template		der Dateiname der Vorlage
+		days			die Tage mit den Gerichten
+		filenames		eine Liste mit Dateinamen, eine Datei pro Kopie
+		difficulty		(optional) die Schwierigkeitsgrade der Sudokus eines
+						Dokuments (in umgekehrter Reihenfolge)
+		workers			(optional) die Anzahl der Prozesse für die Sudokus
+
+	Rückgabe:			eine Liste mit einem dict (Suffix -> MySudoku) pro Datei
+
+	Exceptions:
+		SudokufillerException	wenn die Vorlage mehr Sudokus enthält als
+								Schwierigkeitsgrade gegeben sind'''
+	doc = load(template)
+	for t in doc.getElementsByType(table.Table):
+		if t.getAttribute("name") == "Mensaplan":
+			fill_meal_table(t, days)
+	doc.clear_caches()
+
+	# schwierigkeitsgrade in der reihenfolge in der sie benötigt werden
+	keys = []
+	for t in doc.getElementsByType(table.Table):
+		key = sudoku_key(t.getAttribute("name"))
+		if key is not None and key not in keys:
+			keys.append(key)
+	if len(keys) > len(difficulty):
+		raise SudokufillerException(
+			"Die Vorlage enthält %d Sudokus, aber nur %d Schwierigkeitsgrade" %
+			(len(keys), len(difficulty)))
+	per_doc = list(reversed(difficulty))[:len(keys)]
+
+	sudokus = generate_sudokus(per_doc * len(filenames), workers)
+	result = []
+	try:
+		for filename in filenames:
+			doc_copy = doc.clone()
+			result.append(fill_document_sudokus(doc_copy, sudokus))
+			doc_copy.save(filename)
+			log.info("Mensaplan in '%s' gespeichert" % filename)
+	finally:
+		sudokus.close()
+	return result
@@ -90,6 +90,23 @@ class Node(xml.dom.Node):
     parentNode = None
     nextSibling = None
     previousSibling = None
+    ownerDocument = None
+
+    def _markdirty(self):
+        """ Tells the owner document that the part this node is in has changed
+            Used to decide which parts of a loaded document must be written
+            again on save and which can be copied unchanged.
+        """
+        doc = self.ownerDocument
+        if doc is None or getattr(doc, '_dirty', None) is None:
+            return
+        # The sections are moved to other parents while saving, so look
+        # for the section by name instead of below doc.topnode
+        node = self
+        sections = doc._sectionqnames
+        while node.qname not in sections and node.parentNode is not None:
+            node = node.parentNode
+        doc._dirty.add(node.qname)
 
     def hasChildNodes(self):
         """ Tells whether this element has any children; text nodes,
@@ -133,6 +150,7 @@ class Node(xml.dom.Node):
             else:
                 newChild.previousSibling = None
             newChild.parentNode = self
+            self._markdirty()
         return newChild
 
     def appendChild(self, node):
@@ -147,6 +165,7 @@ class Node(xml.dom.Node):
             node.parentNode.removeChild(node)
         _append_child(self, node)
         node.nextSibling = None
+        self._markdirty()
         return node
 
     def removeChild(self, oldChild):
@@ -163,11 +182,49 @@ class Node(xml.dom.Node):
         if self.ownerDocument:
             self.ownerDocument.clear_caches()
         oldChild.parentNode = None
+        self._markdirty()
         return oldChild
 
+    def cloneNode(self, deep=True, ownerDocument=None):
+        """ Returns a copy of the node that is not attached to any parent.
+            The copy is made without calling the constructors, so no grammar
+            checks are done and the owner document is set in the same pass.
+            If ownerDocument is None the owner of this node is used.
+        """
+        if ownerDocument is None:
+            ownerDocument = getattr(self, 'ownerDocument', None)
+        return _clone_node(self, deep, ownerDocument)
+
 defproperty(Node, "firstChild", doc="First child node, or None.")
 defproperty(Node, "lastChild",  doc="Last child node, or None.")
 
+class _Clone:
+    """ Placeholder instance whose class is replaced in _clone_node """
+
+def _clone_node(node, deep, owner):
+    # fast path for cloneNode; bypasses __init__ of the cloned classes
+    clone = _Clone()
+    clone.__class__ = node.__class__
+    d = clone.__dict__
+    d.update(node.__dict__)
+    d["parentNode"] = d["nextSibling"] = d["previousSibling"] = None
+    if node.nodeType == Node.ELEMENT_NODE:
+        d["attributes"] = node.attributes.copy()
+        d["ownerDocument"] = owner
+        childNodes = d["childNodes"] = []
+        if deep:
+            last = None
+            for child in node.childNodes:
+                c = _clone_node(child, deep, owner)
+                cd = c.__dict__
+                cd["parentNode"] = clone
+                if last is not None:
+                    cd["previousSibling"] = last
+                    last.__dict__["nextSibling"] = c
+                childNodes.append(c)
+                last = c
+    return clone
+
 def _append_child(self, node):
     # fast path with less checks; usable by DOM builders if careful
     childNodes = self.childNodes
@@ -389,6 +446,7 @@ class Element(Node):
 #           raise AttributeError, "Attribute %s:%s is not allowed in element <%s>" % ( prefix, localpart, self.tagName)
         c = AttrConverters()
         self.attributes[prefix + ":" + localpart] = c.convert((namespace, localpart), value, self.qname)
+        self._markdirty()
 
     def getAttrNS(self, namespace, localpart):
         prefix = self.get_nsprefix(namespace)
@@ -397,6 +455,7 @@ class Element(Node):
     def removeAttrNS(self, namespace, localpart):
         prefix = self.get_nsprefix(namespace)
         del self.attributes[prefix + ":" + localpart]
+        self._markdirty()
 
     def getAttribute(self, attr):
         allowed_attrs = self.allowed_attributes()
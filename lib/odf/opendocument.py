@@ -20,7 +20,7 @@
 
 __doc__="""Use OpenDocument to generate your documents."""
 
-import zipfile, time, sys, mimetypes, copy
+import zipfile, time, sys, os, mimetypes, copy, zlib, struct
 from cStringIO import StringIO
 from namespaces import *
 import manifest, meta
@@ -70,6 +70,60 @@ class OpaqueObject:
        self.filename = filename
        self.content = content
 
+class _ZipEntryWriter:
+    """ File-like object that deflates everything written to it directly
+        into a new entry of an open ZipFile.
+        Small writes are collected until CHUNKSIZE bytes are buffered, so
+        only one chunk of the part is kept in memory at any time.
+        The CRC and sizes are written in a data descriptor after the data.
+    """
+    CHUNKSIZE = 65536
+
+    def __init__(self, z, zinfo):
+        self._z = z
+        self._zinfo = zinfo
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.flag_bits |= 0x08
+        zinfo.file_size = zinfo.compress_size = zinfo.CRC = 0
+        zinfo.header_offset = z.fp.tell()
+        z._writecheck(zinfo)
+        z._didModify = True
+        z.fp.write(zinfo.FileHeader(False))
+        self._crc = 0
+        self._compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        self._buffer = []
+        self._buffered = 0
+
+    def write(self, data):
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.CHUNKSIZE:
+            self._flush()
+
+    def _flush(self):
+        data = ''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        self._zinfo.file_size += len(data)
+        self._crc = zlib.crc32(data, self._crc)
+        self._writecompressed(self._compressor.compress(data))
+
+    def _writecompressed(self, data):
+        self._zinfo.compress_size += len(data)
+        self._z.fp.write(data)
+
+    def close(self):
+        self._flush()
+        self._writecompressed(self._compressor.flush())
+        zinfo = self._zinfo
+        zinfo.CRC = self._crc & 0xffffffff
+        self._z.fp.write(struct.pack('<LLLL', zipfile._DD_SIGNATURE, zinfo.CRC,
+            zinfo.compress_size, zinfo.file_size))
+        self._z.filelist.append(zinfo)
+        self._z.NameToInfo[zinfo.filename] = zinfo
+
 class OpenDocument:
     """ A class to hold the content of an OpenDocument document
         Use the xml method to write the XML
@@ -79,10 +133,25 @@ class OpenDocument:
     """
     thumbnail = None
 
+    # The sections of the document that are written to each XML part
+    _partsections = {
+        'content.xml': ((OFFICENS,u'scripts'), (OFFICENS,u'font-face-decls'),
+                        (OFFICENS,u'automatic-styles'), (OFFICENS,u'body')),
+        'styles.xml': ((OFFICENS,u'font-face-decls'), (OFFICENS,u'styles'),
+                       (OFFICENS,u'automatic-styles'), (OFFICENS,u'master-styles')),
+        'settings.xml': ((OFFICENS,u'settings'),),
+    }
+    _sectionqnames = frozenset([(OFFICENS,u'meta')] + [qname
+        for sections in _partsections.values() for qname in sections])
+
     def __init__(self, mimetype, add_generator=True):
         self.mimetype = mimetype
         self.childobjects = []
         self._extra = []
+        # Set by load() to copy unchanged parts from the loaded file on save
+        self._source = None
+        self._sourceparts = {}
+        self._dirty = None
         self.folder = "" # Always empty for toplevel documents
         self.topnode = Document(mimetype=self.mimetype)
         self.topnode.ownerDocument = self
@@ -150,6 +219,91 @@ class OpenDocument:
                 element.setAttrNS(STYLENS, u'name', name)
             self._styles_dict[name] = element
 
+    def clone(self):
+        """ Returns an independent copy of the document
+            The element tree is copied with cloneNode, so loading and filling
+            a template has to be done only once for many similar documents.
+            Pictures and extra files are shared, as they are never changed
+            in place.
+        """
+        doc = copy.copy(self)
+        doc.topnode = self.topnode.cloneNode(ownerDocument=doc)
+        doc.Pictures = self.Pictures.copy()
+        doc._extra = self._extra[:]
+        doc.childobjects = [c.clone() for c in self.childobjects]
+        if self._dirty is not None:
+            doc._dirty = set(self._dirty)
+        # Point the shortcuts (doc.body, doc.text, ...) into the new tree
+        for attr, value in self.__dict__.items():
+            if attr != 'topnode' and isinstance(value, element.Node):
+                setattr(doc, attr, self._clonedshortcut(value, doc))
+        doc.clear_caches()
+        doc.rebuild_caches()
+        return doc
+
+    def _clonedshortcut(self, node, doc):
+        """ Returns the node of the cloned document doc at the place of node
+            save() moves meta and settings out of topnode into the document
+            elements of their files, nodes not below topnode are copied on
+            their own.
+        """
+        path = []
+        while node is not self.topnode:
+            parent = node.parentNode
+            if parent is None:
+                break
+            for idx, e in enumerate(parent.childNodes):
+                if e is node:
+                    path.append(idx)
+                    break
+            node = parent
+        else:
+            cloned = doc.topnode
+            for idx in reversed(path):
+                cloned = cloned.childNodes[idx]
+            return cloned
+        # not below topnode, node is now the root of its tree
+        for idx in reversed(path):
+            node = node.childNodes[idx]
+        return node.cloneNode(ownerDocument=doc)
+
+    def markDirty(self):
+        """ Makes save() write all parts again instead of copying the
+            unchanged ones from the loaded file.
+            Changes made with the DOM methods are tracked automatically, this
+            is only needed after changing e.g. the data of a text node directly.
+        """
+        self._source = None
+
+    def _opensource(self):
+        """ Opens the file the document was loaded from if it is unchanged """
+        if self._source is None or self._dirty is None:
+            return None
+        filename, mtime, size = self._source
+        try:
+            # This also catches saving over the loaded file, which is
+            # truncated before we get here
+            st = os.stat(filename)
+            if (st.st_mtime, st.st_size) != (mtime, size):
+                return None
+            return zipfile.ZipFile(filename)
+        except (IOError, OSError, zipfile.BadZipfile):
+            return None
+
+    def _israwpart(self, arcname, content=None):
+        """ Tells if the entry can be copied unchanged from the loaded file
+            For XML parts none of its sections may have changed, other
+            entries must still have the content they were loaded with.
+        """
+        if self._src is None or not self._sourceparts.has_key(arcname):
+            return False
+        if self._partsections.has_key(arcname):
+            for qname in self._partsections[arcname]:
+                if qname in self._dirty:
+                    return False
+            return True
+        return self._sourceparts[arcname] is content
+
     def toXml(self, filename=''):
         xml=StringIO()
         xml.write(_XMLPROLOGUE)
@@ -177,6 +331,11 @@ class OpenDocument:
             Always written as a bytestream in UTF-8 encoding
         """
         xml=StringIO()
+        self._writecontentxml(xml)
+        return xml.getvalue()
+
+    def _writecontentxml(self, xml):
+        """ Writes the content.xml file to the file object xml """
         xml.write(_XMLPROLOGUE)
         x = DocumentContent()
         x.write_open_tag(0, xml)
@@ -195,7 +354,6 @@ class OpenDocument:
             a.toXml(1, xml)
         self.body.toXml(1, xml)
         x.write_close_tag(0, xml)
-        return xml.getvalue()
 
     def manifestxml(self):
         """ Generates the manifest.xml file """
@@ -206,22 +364,30 @@ class OpenDocument:
 
     def metaxml(self):
         """ Generates the meta.xml file """
+        xml=StringIO()
+        self._writemetaxml(xml)
+        return xml.getvalue()
+
+    def _writemetaxml(self, xml):
+        """ Writes the meta.xml file to the file object xml """
         self._replaceGenerator()
         x = DocumentMeta()
         x.addElement(self.meta)
-        xml=StringIO()
         xml.write(_XMLPROLOGUE)
         x.toXml(0,xml)
-        return xml.getvalue()
 
     def settingsxml(self):
         """ Generates the settings.xml file """
+        xml=StringIO()
+        self._writesettingsxml(xml)
+        return xml.getvalue()
+
+    def _writesettingsxml(self, xml):
+        """ Writes the settings.xml file to the file object xml """
         x = DocumentSettings()
         x.addElement(self.settings)
-        xml=StringIO()
         xml.write(_XMLPROLOGUE)
         x.toXml(0,xml)
-        return xml.getvalue()
 
     def _parseoneelement(self, top, stylenamelist):
         """ Finds references to style objects in master-styles
@@ -264,6 +430,11 @@ class OpenDocument:
     def stylesxml(self):
         """ Generates the styles.xml file """
         xml=StringIO()
+        self._writestylesxml(xml)
+        return xml.getvalue()
+
+    def _writestylesxml(self, xml):
+        """ Writes the styles.xml file to the file object xml """
         xml.write(_XMLPROLOGUE)
         x = DocumentStyles()
         x.write_open_tag(0, xml)
@@ -278,7 +449,6 @@ class OpenDocument:
         if self.masterstyles.hasChildNodes():
             self.masterstyles.toXml(1, xml)
         x.write_close_tag(0, xml)
-        return xml.getvalue()
 
     def addPicture(self, filename, mediatype=None, content=None):
         """ Add a picture
@@ -360,7 +530,9 @@ class OpenDocument:
             what_it_is, fileobj, mediatype = picturerec
             self.manifest.addElement(manifest.FileEntry(fullpath="%s%s" % ( folder ,arcname), mediatype=mediatype))
             hasPictures = True
-            if what_it_is == IS_FILENAME:
+            if object is self and self._israwpart(arcname, picturerec):
+                self._zipcopyraw(arcname)
+            elif what_it_is == IS_FILENAME:
                 self._z.write(fileobj, arcname, zipfile.ZIP_STORED)
             else:
                 zi = zipfile.ZipInfo(str(arcname), self._now)
@@ -404,6 +576,7 @@ class OpenDocument:
         self._z = outputfp
         self._now = time.localtime()[:6]
         self.manifest = manifest.Manifest()
+        self._src = self._opensource()
 
         # Write mimetype
         zi = zipfile.ZipInfo('mimetype', self._now)
@@ -420,10 +593,13 @@ class OpenDocument:
         if self.thumbnail is not None:
             self.manifest.addElement(manifest.FileEntry(fullpath="Thumbnails/", mediatype=''))
             self.manifest.addElement(manifest.FileEntry(fullpath="Thumbnails/thumbnail.png", mediatype=''))
-            zi = zipfile.ZipInfo("Thumbnails/thumbnail.png", self._now)
-            zi.compress_type = zipfile.ZIP_DEFLATED
-            zi.external_attr = UNIXPERMS
-            self._z.writestr(zi, self.thumbnail)
+            if self._israwpart("Thumbnails/thumbnail.png", self.thumbnail):
+                self._zipcopyraw("Thumbnails/thumbnail.png")
+            else:
+                zi = zipfile.ZipInfo("Thumbnails/thumbnail.png", self._now)
+                zi.compress_type = zipfile.ZIP_DEFLATED
+                zi.external_attr = UNIXPERMS
+                self._z.writestr(zi, self.thumbnail)
 
         # Write any extra files
         for op in self._extra:
@@ -432,18 +608,66 @@ class OpenDocument:
             zi = zipfile.ZipInfo(op.filename.encode('utf-8'), self._now)
             zi.compress_type = zipfile.ZIP_DEFLATED
             zi.external_attr = UNIXPERMS
-            if op.content is not None:
+            if op.content is None:
+                continue
+            if self._israwpart(op.filename, op.content):
+                self._zipcopyraw(op.filename)
+            else:
                 self._z.writestr(zi, op.content)
         # Write manifest
         zi = zipfile.ZipInfo("META-INF/manifest.xml", self._now)
         zi.compress_type = zipfile.ZIP_DEFLATED
         zi.external_attr = UNIXPERMS
         self._z.writestr(zi, self.manifestxml() )
+        if self._src is not None:
+            self._src.close()
+        del self._src
         del self._z
         del self._now
         del self.manifest
 
 
+    def _zipwritepart(self, arcname, writepart):
+        """ Streams a part into a new deflated zip entry
+            writepart is called with a file object to write the XML to
+        """
+        zi = zipfile.ZipInfo(arcname, self._now)
+        zi.external_attr = UNIXPERMS
+        f = _ZipEntryWriter(self._z, zi)
+        writepart(f)
+        f.close()
+
+    def _zipcopyraw(self, arcname):
+        """ Copies an entry of the loaded file to the new zip file
+            The compressed data is copied as it is, without inflating and
+            deflating it again.
+        """
+        info = self._src.getinfo(arcname)
+        fp = self._src.fp
+        fp.seek(info.header_offset)
+        fheader = struct.unpack(zipfile.structFileHeader, fp.read(zipfile.sizeFileHeader))
+        fp.seek(fheader[zipfile._FH_FILENAME_LENGTH] + fheader[zipfile._FH_EXTRA_FIELD_LENGTH], 1)
+
+        zi = zipfile.ZipInfo(info.filename, self._now)
+        zi.compress_type = info.compress_type
+        zi.external_attr = UNIXPERMS
+        zi.CRC = info.CRC
+        zi.compress_size = info.compress_size
+        zi.file_size = info.file_size
+        zi.header_offset = self._z.fp.tell()
+        self._z._writecheck(zi)
+        self._z._didModify = True
+        self._z.fp.write(zi.FileHeader(False))
+        remaining = info.compress_size
+        while remaining > 0:
+            data = fp.read(min(remaining, _ZipEntryWriter.CHUNKSIZE))
+            if not data:
+                raise zipfile.BadZipfile, "Truncated entry %s" % arcname
+            self._z.fp.write(data)
+            remaining = remaining - len(data)
+        self._z.filelist.append(zi)
+        self._z.NameToInfo[zi.filename] = zi
+
     def _saveXmlObjects(self, object, folder):
         if self == object:
             self.manifest.addElement(manifest.FileEntry(fullpath="/", mediatype=object.mimetype))
@@ -451,33 +675,30 @@ class OpenDocument:
             self.manifest.addElement(manifest.FileEntry(fullpath=folder, mediatype=object.mimetype))
         # Write styles
         self.manifest.addElement(manifest.FileEntry(fullpath="%sstyles.xml" % folder, mediatype="text/xml"))
-        zi = zipfile.ZipInfo("%sstyles.xml" % folder, self._now)
-        zi.compress_type = zipfile.ZIP_DEFLATED
-        zi.external_attr = UNIXPERMS
-        self._z.writestr(zi, object.stylesxml() )
+        if self == object and self._israwpart("styles.xml"):
+            self._zipcopyraw("styles.xml")
+        else:
+            self._zipwritepart("%sstyles.xml" % folder, object._writestylesxml)
 
         # Write content
         self.manifest.addElement(manifest.FileEntry(fullpath="%scontent.xml" % folder, mediatype="text/xml"))
-        zi = zipfile.ZipInfo("%scontent.xml" % folder, self._now)
-        zi.compress_type = zipfile.ZIP_DEFLATED
-        zi.external_attr = UNIXPERMS
-        self._z.writestr(zi, object.contentxml() )
+        if self == object and self._israwpart("content.xml"):
+            self._zipcopyraw("content.xml")
+        else:
+            self._zipwritepart("%scontent.xml" % folder, object._writecontentxml)
 
         # Write settings
         if self == object and self.settings.hasChildNodes():
             self.manifest.addElement(manifest.FileEntry(fullpath="settings.xml",mediatype="text/xml"))
-            zi = zipfile.ZipInfo("%ssettings.xml" % folder, self._now)
-            zi.compress_type = zipfile.ZIP_DEFLATED
-            zi.external_attr = UNIXPERMS
-            self._z.writestr(zi, object.settingsxml() )
+            if self._israwpart("settings.xml"):
+                self._zipcopyraw("settings.xml")
+            else:
+                self._zipwritepart("%ssettings.xml" % folder, object._writesettingsxml)
 
-        # Write meta
+        # Write meta, never copied as the generator is always replaced
         if self == object:
             self.manifest.addElement(manifest.FileEntry(fullpath="meta.xml",mediatype="text/xml"))
-            zi = zipfile.ZipInfo("meta.xml", self._now)
-            zi.compress_type = zipfile.ZIP_DEFLATED
-            zi.external_attr = UNIXPERMS
-            self._z.writestr(zi, object.metaxml() )
+            self._zipwritepart("meta.xml", object._writemetaxml)
 
         # Write subobjects
         subobjectnum = 1
@@ -559,6 +780,9 @@ def load(odffile):
     z = zipfile.ZipFile(odffile)
     mimetype = z.read('mimetype')
     doc = OpenDocument(mimetype, add_generator=False)
+    if isinstance(odffile, basestring):
+        st = os.stat(odffile)
+        doc._source = (odffile, st.st_mtime, st.st_size)
 
     # Look in the manifest file to see if which of the four files there are
     manifestpart = z.read('META-INF/manifest.xml')
@@ -579,13 +803,16 @@ def load(odffile):
             inpsrc.setByteStream(StringIO(xmlpart))
             parser.parse(inpsrc)
             del doc._parsing
+            doc._sourceparts[xmlfile] = None
         except KeyError, v: pass
     # FIXME: Add subobjects correctly here
     for mentry,mvalue in manifest.items():
         if mentry[:9] == "Pictures/" and len(mentry) > 9:
-            doc.addPicture(mvalue['full-path'], mvalue['media-type'], z.read(mentry))
+            fullpath = doc.addPicture(mvalue['full-path'], mvalue['media-type'], z.read(mentry))
+            doc._sourceparts[mentry] = doc.Pictures[fullpath]
         elif mentry == "Thumbnails/thumbnail.png":
             doc.addThumbnail(z.read(mentry))
+            doc._sourceparts[mentry] = doc.thumbnail
         elif mentry in ('settings.xml', 'meta.xml', 'content.xml', 'styles.xml'):
             pass
         else:
@@ -593,8 +820,13 @@ def load(odffile):
                 doc._extra.append(OpaqueObject(mvalue['full-path'], mvalue['media-type'], None))
             else:
                 doc._extra.append(OpaqueObject(mvalue['full-path'], mvalue['media-type'], z.read(mentry)))
+                doc._sourceparts[mentry] = doc._extra[-1].content
             # Add the SUN junk here to the struct somewhere
             # It is cached data, so it can be out-of-date
+    # Encrypted entries can't be copied as they are
+    for info in z.infolist():
+        if info.flag_bits & 0x1 and doc._sourceparts.has_key(info.filename):
+            del doc._sourceparts[info.filename]
     z.close()
     b = doc.getElementsByType(Body)
     if mimetype[:39] == 'application/vnd.oasis.opendocument.text':
@@ -611,5 +843,7 @@ def load(odffile):
         doc.image = b[0].firstChild
     elif mimetype[:42] == 'application/vnd.oasis.opendocument.formula':
         doc.formula = b[0].firstChild
+    # From here on changes to the tree are tracked
+    doc._dirty = set()
     return doc
 # vim: set expandtab sw=4 :
@@ -100,7 +100,8 @@ def fill_meal_table(meals_table, days):
 		days			die Tage mit den Gerichten
 
 	Exceptions:		
-		MealfillerException		wenn das gegebene Dokument fehlerhaft ist
+		MealfillerException		wenn Zeilen angelegt werden müssen, die Tabelle
+								aber keine Zeile als Vorlage hat
 
 	Links:
 		odfpy			http://opendocumentfellowship.com/projects/odfpy
@@ -150,6 +151,12 @@ def fill_meal_table(meals_table, days):
 	
 	rows = meals_table.getElementsByType(table.TableRow)
 
+	# für mehr tage als zeilen werden zusätzliche zeilen angelegt, nur dann wird
+	# eine zeile als vorlage gebraucht (siehe extend_meal_table)
+	if len(days) > max(len(rows) - 1, 0):
+		extend_meal_table(meals_table, len(days))
+		rows = meals_table.getElementsByType(table.TableRow)
+
 	# beim durchlaufen lassen wir die erste zeile weg (Überschriften)
 	for day, row in izip(days, rows[1:]):
 		if day.meals == None:
@@ -168,6 +175,66 @@ def fill_meal_table(meals_table, days):
 		format_meal_cell(cells[4], day.meals[Meal.VEG])
 		format_meal_cell(cells[5], day.meals[Meal.B])
 		
+def extend_meal_table(meals_table, row_count):
+	'''Erweitert eine Tabelle für den Mensaplan auf row_count Zeilen (ohne Überschrift).
+	Fehlende Zeilen werden als Kopie der letzten Zeile hinter dieser eingefügt.
+
+	Parameter:
+		meals_table		die Tabelle die erweitert werden soll
+		row_count		die Anzahl der benötigten Zeilen für Tage
+
+	Exceptions:
+		MealfillerException		wenn die Tabelle keine Zeile als Vorlage hat
+	'''
+	rows = meals_table.getElementsByType(table.TableRow)
+	if len(rows) < 2:
+		raise MealfillerException("Tabelle '%s' hat keine Zeile als Vorlage" %
+			meals_table.getAttribute("name"))
+
+	prototype = last = rows[-1]
+	parent = prototype.parentNode
+	for i in xrange(row_count - (len(rows) - 1)):
+		row = prototype.cloneNode()
+		parent.insertBefore(row, last.nextSibling)
+		last = row
+
+	# der cache mit den elementen des dokuments ist jetzt veraltet
+	if meals_table.ownerDocument:
+		meals_table.ownerDocument.clear_caches()
+
+def fill_meal_tables(meals_table, weeks):
+	'''Füllt mehrere Wochen (oder Mensen) in ein Dokument. Für jede weitere Woche
+	wird eine Kopie der ungefüllten Tabelle hinter der vorherigen eingefügt und
+	mit dem Namen der Tabelle und einer fortlaufenden Nummer benannt.
+
+	Parameter:
+		meals_table		die Tabelle die als Vorlage dient und die erste Woche enthält
+		weeks			eine Liste mit Listen von Tagen (eine pro Woche bzw. Mensa)
+
+	Rückgabe:			eine Liste mit den gefüllten Tabellen
+
+	Exceptions:
+		MealfillerException		wenn das gegebene Dokument fehlerhaft ist
+	'''
+	name = meals_table.getAttribute("name")
+	parent = meals_table.parentNode
+
+	# erst kopieren, damit alle tabellen aus der ungefüllten vorlage entstehen
+	tables = [meals_table]
+	for idx in xrange(2, len(weeks) + 1):
+		clone = meals_table.cloneNode()
+		clone.setAttribute("name", u"%s_%d" % (name, idx))
+		parent.insertBefore(clone, tables[-1].nextSibling)
+		tables.append(clone)
+
+	for days, t in izip(weeks, tables):
+		fill_meal_table(t, days)
+
+	# der cache mit den elementen des dokuments ist jetzt veraltet
+	if meals_table.ownerDocument:
+		meals_table.ownerDocument.clear_caches()
+	return tables
+
 class MensaplanParser:
 
 	def __init__(self, raw_data):
@@ -14,6 +14,9 @@ Create a sudoku of 3x3:
     sudoku.solve()
     sudoku.to_board().save("file_solved.sdk")
 
+# Use the faster bitmask engine:
+    sudoku = Sudoku(Board(3), engine="bitmask")
+
 See pdf.py and image.py for PDF and image ouput.
 
 
@@ -34,8 +37,9 @@ Copyright (C) 2005-2008  XosÃ© Otero <xoseotero@users.sourceforge.net>
   Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 """
 
-__all__ = ["Sudoku", "Board"]
+__all__ = ["Sudoku", "Board", "BitmaskSudoku", "Cancelled"]
 
 
-from sudoku import Sudoku
+from sudoku import Sudoku, Cancelled
 from sudoku import Board
+from bitmask import BitmaskSudoku
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+"""Module to solve many boards at once with NumPy.
+
+This exports the functions:
+  - propagate -- apply naked and hidden singles to a stack of boards
+  - solve_many -- solve a list of boards
+
+The possible values of K boards of N numbers are a K x N^2 array of
+bitmasks, the masks of the bitmask engine, and every step of the singles
+techniques works on all the boards at the same time. The boards that the
+singles can't solve are solved one by one with a Sudoku engine.
+
+NumPy is optional: without it all the boards are solved one by one.
+
+Copyright (C) 2010  Martin Thurau <martin.thurau@gmail.com>
+
+"""
+
+__all__ = ["propagate", "solve_many", "HAVE_NUMPY"]
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from board import Board
+from sudoku import Sudoku
+from bitmask import geometry
+
+
+HAVE_NUMPY = numpy is not None
+
+# cellsize -> (units, units of every position)
+_tables = {}
+
+def _unit_tables(cellsize):
+    """Return the index arrays of a board size.
+
+    Arguments:
+    cellsize -- tuple of the region width and height
+
+    """
+    if cellsize not in _tables:
+        geo = geometry(cellsize)
+        units = numpy.array(geo.units, dtype=numpy.intp)
+        position_units = [[] for k in xrange(geo.size)]
+        for u, unit in enumerate(geo.units):
+            for k in unit:
+                position_units[k].append(u)
+        _tables[cellsize] = (units, numpy.array(position_units,
+                                                dtype=numpy.intp))
+    return _tables[cellsize]
+
+def _single(masks):
+    """Return a boolean array with the masks with only one value."""
+    return (masks != 0) & ((masks & (masks - 1)) == 0)
+
+def _or(masks, axis):
+    """Return the bitwise or of masks along axis."""
+    return numpy.bitwise_or.reduce(masks, axis=axis)
+
+
+def propagate(masks, cellsize, max_steps=None):
+    """Apply naked and hidden singles until nothing changes.
+
+    masks is a K x N^2 array with a bitmask of the possible values of
+    every position of every board (bit v - 1 for the number v), like the
+    masks of the bitmask engine. It's changed in place. Return a boolean
+    array with the boards that have a position without possible values.
+
+    Arguments:
+    masks -- K x N^2 array of uint32 masks
+    cellsize -- tuple of the region width and height
+
+    Keyword arguments:
+    max_steps -- the maximum number of steps (default None, no limit)
+
+    """
+    units, position_units = _unit_tables(cellsize)
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        steps += 1
+        before = masks.copy()
+
+        # naked singles: remove the numbers of solved positions from the
+        # other positions of their units
+        solved = _single(masks)
+        numbers = numpy.where(solved, masks, 0)
+        in_unit = _or(numbers[:, units], 2)
+        seen = _or(in_unit[:, position_units], 2)
+        masks &= numpy.where(solved, masks, ~seen)
+
+        # hidden singles: a number possible in only one position of a unit
+        per_unit = masks[:, units]
+        once = numpy.zeros(per_unit.shape[:2], dtype=masks.dtype)
+        twice = numpy.zeros(per_unit.shape[:2], dtype=masks.dtype)
+        for x in xrange(per_unit.shape[2]):
+            twice |= once & per_unit[:, :, x]
+            once |= per_unit[:, :, x]
+        uniq = _or((once & ~twice)[:, position_units], 2)
+        hidden = masks & uniq
+        found = (hidden != 0) & ~solved
+        masks[found] = hidden[found]
+
+        if (masks == before).all():
+            break
+
+    return (masks == 0).any(axis=1)
+
+def _valid(masks, cellsize):
+    """Return a boolean array with the boards that are solved and valid.
+
+    Arguments:
+    masks -- K x N^2 array of masks
+    cellsize -- tuple of the region width and height
+
+    """
+    units = _unit_tables(cellsize)[0]
+    n = cellsize[0] * cellsize[1]
+    single = _single(masks).all(axis=1)
+    complete = (_or(masks[:, units], 2) == (1 << n) - 1).all(axis=1)
+    # with all the positions solved, n different numbers in a unit of n
+    # positions are all the numbers once
+    return single & complete
+
+def _solve_one(board, engine):
+    """Return the board solved with a Sudoku engine or None.
+
+    Arguments:
+    board -- the board
+    engine -- the engine name
+
+    """
+    sudoku = Sudoku(board, "hard", engine=engine)
+    if sudoku.solve():
+        return sudoku.to_board()
+    return None
+
+def solve_many(boards, engine="bitmask", fallback=True):
+    """Solve a list of boards.
+
+    Return a list with the solved board, or None, of every board.
+
+    Arguments:
+    boards -- a list of boards of the same size
+
+    Keyword arguments:
+    engine -- the engine for the boards not solved with singles (default
+              "bitmask")
+    fallback -- if False the boards not solved with singles are None
+                (default True)
+
+    """
+    if not boards:
+        return []
+    if numpy is None:
+        return [_solve_one(board, engine) for board in boards]
+
+    cellsize = tuple(boards[0].cellsize)
+    n = boards[0].boardsize
+    for board in boards:
+        if tuple(board.cellsize) != cellsize:
+            raise ValueError("all the boards must have the same size")
+
+    # the numbers of all the boards, one row per board
+    numbers = numpy.frombuffer("".join([board.tostring()
+                                        for board in boards]),
+                               dtype=numpy.uint8).reshape(len(boards), n * n)
+    given = numbers > 0
+    masks = numpy.empty(numbers.shape, dtype=numpy.uint32)
+    masks.fill((1 << n) - 1)
+    masks[given] = numpy.left_shift(1, numbers[given].astype(numpy.uint32) - 1)
+
+    propagate(masks, cellsize)
+    valid = _valid(masks, cellsize)
+    values = numpy.zeros(numbers.shape, dtype=numpy.uint8)
+    for v in xrange(n):
+        values[masks == 1 << v] = v + 1
+
+    solutions = []
+    for k, board in enumerate(boards):
+        if valid[k]:
+            solution = Board(cellsize)
+            solution.load_numbers(values[k].tolist(), cellsize)
+            solutions.append(solution)
+        elif fallback:
+            solutions.append(_solve_one(board, engine))
+        else:
+            solutions.append(None)
+    return solutions
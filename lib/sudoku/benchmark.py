@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+
+"""Module to benchmark the solvers with the bundled puzzle sets.
+
+This exports the functions:
+  - bench_solvers -- time the solvers on puzzle sets
+  - bench_generation -- time the creation of sudokus by board size
+  - bench_batch -- compare batch solving with solving one by one
+  - run_suite -- time the main operations, with distributions
+  - compare_suites -- compare two results of run_suite
+
+Run it as a script to compare the solvers:
+  python benchmark.py [set ...]
+or to get the scaling curve of the creation with the board size:
+  python benchmark.py --scaling [cellsize ...]
+or to get the throughput of the batch solver (needs NumPy):
+  python benchmark.py --batch [set ...]
+or to run the suite and save the results as JSON, and to compare them:
+  python benchmark.py --suite [file.json]
+  python benchmark.py --compare old.json new.json
+
+The puzzle sets are loaded with puzzles.load_puzzles, collection files
+(.sdkc) can be given too.
+
+Copyright (C) 2010  Martin Thurau <martin.thurau@gmail.com>
+
+"""
+
+__all__ = ["PUZZLE_SETS", "SOLVERS", "SCALING", "load_puzzles",
+           "bench_solvers", "bench_generation", "bench_batch", "run_suite",
+           "compare_suites"]
+
+
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from timeit import default_timer
+
+from board import Board
+from sudoku import Sudoku
+import dlx
+import batchsolve
+from sudoku import difficulty
+from puzzles import PUZZLE_SETS, load_puzzles
+
+# name -> function(board) returning if the board was solved
+SOLVERS = {
+    "list": lambda board: Sudoku(board, "hard").solve(),
+    "bitmask": lambda board: Sudoku(board, "hard", engine="bitmask").solve(),
+    "dlx": lambda board: dlx.solve(board) is not None,
+    "dlx-unique": lambda board: dlx.count_solutions(board, 2) == 1,
+}
+
+# cellsize -> (difficulties, sudokus created) for the scaling curve
+SCALING = {
+    2: (("easy", "normal", "hard"), 20),
+    3: (("easy", "normal", "hard"), 10),
+    4: (("easy", "normal", "hard"), 3),
+    5: (("easy", "normal"), 1),
+}
+
+
+def bench_solvers(sets=PUZZLE_SETS, solvers=None):
+    """Time the solvers on the puzzle sets.
+
+    Return a list of (set, solver, solved, puzzles, seconds) tuples.
+
+    Keyword arguments:
+    sets -- the puzzle set names (default all)
+    solvers -- the solver names of SOLVERS (default all)
+
+    """
+    if solvers is None:
+        solvers = sorted(SOLVERS.keys())
+
+    results = []
+    for name in sets:
+        boards = load_puzzles(name)
+        for solver in solvers:
+            function = SOLVERS[solver]
+            solved = 0
+            start = default_timer()
+            for board in boards:
+                if function(board):
+                    solved += 1
+            results.append((name, solver, solved, len(boards),
+                            default_timer() - start))
+    return results
+
+def bench_generation(cellsizes=None, seed=0):
+    """Time the creation of sudokus with the bitmask engine.
+
+    Return a list of (cellsize, difficulty, sudokus, givens, seconds)
+    tuples, givens is the average of the numbers of the sudokus.
+
+    Keyword arguments:
+    cellsizes -- the cellsizes of SCALING (default all)
+    seed -- the seed of the first sudoku, the next ones use seed + 1, etc.
+            (default 0)
+
+    """
+    if cellsizes is None:
+        cellsizes = sorted(SCALING.keys())
+
+    results = []
+    for cellsize in cellsizes:
+        difficulties, count = SCALING[cellsize]
+        for difficulty in difficulties:
+            givens = 0
+            start = default_timer()
+            for n in xrange(count):
+                sudoku = Sudoku(Board(cellsize), difficulty, engine="bitmask")
+                sudoku.create(seed=seed + n)
+                givens += len(sudoku.to_board().tostring().replace("\0", ""))
+            results.append((cellsize, difficulty, count,
+                            float(givens) / count,
+                            default_timer() - start))
+    return results
+
+def bench_batch(sets=PUZZLE_SETS, repeat=20):
+    """Compare the batch solver with the bitmask engine.
+
+    Return a list of (method, boards, solved, boards per second) tuples.
+
+    Keyword arguments:
+    sets -- the puzzle set names (default all)
+    repeat -- times every board is solved (default 20)
+
+    """
+    boards = []
+    for name in sets:
+        boards.extend(load_puzzles(name))
+    boards = boards * repeat
+
+    methods = (
+        ("bitmask", lambda: [SOLVERS["bitmask"](board) for board in boards]),
+        ("batch", lambda: batchsolve.solve_many(boards)),
+        ("batch-singles", lambda: batchsolve.solve_many(boards,
+                                                        fallback=False)),
+    )
+    results = []
+    for method, function in methods:
+        start = default_timer()
+        solved = len([x for x in function() if x])
+        results.append((method, len(boards), solved,
+                        len(boards) / (default_timer() - start)))
+    return results
+
+def _distribution(samples):
+    """Return the statistics of a list of numbers as a dict.
+
+    Arguments:
+    samples -- the numbers
+
+    """
+    samples = sorted(samples)
+    n = len(samples)
+    mean = float(sum(samples)) / n
+    variance = sum([(x - mean) ** 2 for x in samples]) / n
+    return {"n": n,
+            "min": samples[0],
+            "median": samples[n // 2],
+            "mean": mean,
+            "p90": samples[min(n - 1, int(n * 0.9))],
+            "max": samples[-1],
+            "stdev": variance ** 0.5}
+
+def _measure(function, arguments):
+    """Call function once with every argument.
+
+    Return a dict with the distributions of the milliseconds ("ms") and
+    of the live objects ("live_objects") of every call. The live objects
+    are the difference of len(gc.get_objects()) after and before the
+    call, with the garbage collector disabled meanwhile: the containers
+    (lists, dicts, instances...) created by the call and still alive
+    after it, like results and cached data. Numbers and strings aren't
+    tracked by the collector, and Python 2 has no count of all the
+    allocations. The objects are counted outside of the timed call.
+
+    Arguments:
+    function -- the function
+    arguments -- a list with the argument of every call
+
+    """
+    times = []
+    objects = []
+    enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for argument in arguments:
+            count = len(gc.get_objects())
+            start = default_timer()
+            function(argument)
+            elapsed = default_timer() - start
+            # counted before objects.append creates its bound method
+            count = len(gc.get_objects()) - count
+            times.append(1000.0 * elapsed)
+            objects.append(count)
+    finally:
+        if enabled:
+            gc.enable()
+    return {"ms": _distribution(times), "live_objects": _distribution(objects)}
+
+def _suite_cases(quick):
+    """Return the cases of the suite as (name, function, arguments) tuples.
+
+    Arguments:
+    quick -- use less sudokus
+
+    """
+    sets = dict([(name, load_puzzles(name))
+                 for name in ("easy", "hard", "minimum")])
+    creations = quick and 3 or 10
+
+    cases = []
+    for engine in ("list", "bitmask"):
+        for name, boards in sorted(sets.items()):
+            cases.append(("solve/%s/%s" % (engine, name),
+                          lambda board, engine=engine:
+                              Sudoku(board, "hard", engine=engine).solve(),
+                          boards))
+    for level in ("easy", "normal", "hard"):
+        cases.append(("create/bitmask/%s" % level,
+                      lambda seed, level=level:
+                          Sudoku(Board(3), level,
+                                 engine="bitmask").create(seed=seed),
+                      range(creations)))
+    for name, boards in sorted(sets.items()):
+        cases.append(("difficulty/%s" % name, difficulty, boards))
+
+    boards = sets["easy"] + sets["hard"]
+    directory = tempfile.mkdtemp()
+    filenames = [os.path.join(directory, "%d.sdk" % x)
+                 for x in xrange(len(boards))]
+    cases.append(("board/save",
+                  lambda (board, filename): board.save(filename),
+                  zip(boards, filenames)))
+    cases.append(("board/load",
+                  lambda filename: Board(filename=filename),
+                  filenames))
+    cases.append(("image", _render_image,
+                  zip(sets["easy"], [filename + ".png"
+                                     for filename in filenames])))
+    return cases, directory
+
+def _render_image((board, filename)):
+    """Render board to filename with image.Image."""
+    import image
+    image.Image(board, filename)
+
+def run_suite(quick=False):
+    """Time solving, creation, difficulty, loading, saving and rendering.
+
+    Return a dict that can be saved as JSON, with the distribution of the
+    times and live objects of every case in "results" (see _measure).
+    Cases that can't run, like rendering without PIL, are in "skipped"
+    with the reason.
+
+    Keyword arguments:
+    quick -- create less sudokus (default False)
+
+    """
+    suite = {"python": platform.python_version(),
+             "platform": platform.platform(),
+             "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+             "results": {},
+             "skipped": {}}
+    cases, directory = _suite_cases(quick)
+    try:
+        for name, function, arguments in cases:
+            try:
+                suite["results"][name] = _measure(function, arguments)
+            except ImportError, e:
+                suite["skipped"][name] = str(e)
+    finally:
+        for filename in os.listdir(directory):
+            os.remove(os.path.join(directory, filename))
+        os.rmdir(directory)
+    return suite
+
+def compare_suites(old, new):
+    """Compare two results of run_suite by the median times.
+
+    Return a list of (case, old median, new median, new / old) tuples of
+    the cases in both results.
+
+    Arguments:
+    old -- the first result
+    new -- the second result
+
+    """
+    comparison = []
+    for name in sorted(new["results"].keys()):
+        if name not in old["results"]:
+            continue
+        before = old["results"][name]["ms"]["median"]
+        after = new["results"][name]["ms"]["median"]
+        comparison.append((name, before, after,
+                           before and after / before or None))
+    return comparison
+
+
+def main(args):
+    if args and args[0] == "--suite":
+        suite = run_suite()
+        if len(args) > 1:
+            f = file(args[1], "w")
+            json.dump(suite, f, indent=2, sort_keys=True)
+            f.close()
+        else:
+            print json.dumps(suite, indent=2, sort_keys=True)
+        return
+
+    if args and args[0] == "--compare":
+        old = json.load(file(args[1]))
+        new = json.load(file(args[2]))
+        print "%-28s %12s %12s %8s" % ("case", "old [ms]", "new [ms]",
+                                       "new/old")
+        for name, before, after, ratio in compare_suites(old, new):
+            print "%-28s %12.3f %12.3f %8s" % \
+                  (name, before, after, ratio and "%.2f" % ratio or "-")
+        return
+
+    if args and args[0] == "--batch":
+        if not batchsolve.HAVE_NUMPY:
+            print "NumPy not found, the batch solver solves one by one"
+        print "%-14s %8s %8s %10s" % ("method", "boards", "solved",
+                                      "boards/s")
+        for method, boards, solved, speed in \
+                bench_batch(args[1:] or PUZZLE_SETS):
+            print "%-14s %8d %8d %10.1f" % (method, boards, solved, speed)
+        return
+
+    if args and args[0] == "--scaling":
+        cellsizes = [int(arg) for arg in args[1:]] or None
+        print "%-6s %-8s %8s %8s %12s" % ("board", "level", "sudokus",
+                                          "givens", "sudoku [s]")
+        for cellsize, difficulty, count, givens, seconds in \
+                bench_generation(cellsizes):
+            n = cellsize ** 2
+            print "%-6s %-8s %8d %8.1f %12.3f" % \
+                  ("%dx%d" % (n, n), difficulty, count, givens,
+                   seconds / count)
+        return
+
+    sets = args or PUZZLE_SETS
+    print "%-10s %-12s %9s %10s %12s" % ("set", "solver", "solved",
+                                         "total [s]", "puzzle [ms]")
+    for name, solver, solved, puzzles, seconds in bench_solvers(sets):
+        print "%-10s %-12s %4d/%-4d %10.3f %12.2f" % \
+              (name, solver, solved, puzzles, seconds,
+               1000.0 * seconds / puzzles)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,535 @@
+# -*- coding: utf-8 -*-
+
+"""Module with a bitmask based candidate engine.
+
+This exports the classes:
+  - Geometry -- precomputed units and peers of a board size
+  - BitmaskSudoku -- Sudoku with one bitmask of possible values per position
+
+This exports the functions:
+  - geometry -- return the (cached) Geometry for a cellsize
+  - popcount -- return the number of possible values in a mask
+  - lowest_bit -- return the lowest possible value of a mask as a mask
+  - bit_value -- return the number of a mask with only one value
+  - mask_values -- return the numbers of a mask as a list
+
+Bit v - 1 of a mask is set if v is a possible value.
+
+Copyright (C) 2010  Martin Thurau <martin.thurau@gmail.com>
+
+"""
+
+__all__ = ["Geometry", "BitmaskSudoku", "geometry", "popcount", "lowest_bit",
+           "bit_value", "mask_values"]
+
+
+from sudoku import Sudoku, register_engine
+from subsets import subset_eliminations
+
+
+# number of set bits for all 16 bit numbers
+_POPCOUNT = [0]
+for _i in xrange(1, 1 << 16):
+    _POPCOUNT.append(_POPCOUNT[_i >> 1] + (_i & 1))
+del _i
+
+
+def popcount(mask):
+    """Return the number of possible values in mask.
+
+    Arguments:
+    mask -- the mask (boards up to 32x32)
+
+    """
+    return _POPCOUNT[mask & 0xffff] + _POPCOUNT[mask >> 16]
+
+def lowest_bit(mask):
+    """Return a mask with only the lowest possible value of mask.
+
+    Arguments:
+    mask -- the mask
+
+    """
+    return mask & -mask
+
+def bit_value(bit):
+    """Return the number of a mask with only one possible value.
+
+    Arguments:
+    bit -- the mask
+
+    """
+    return bit.bit_length()
+
+def mask_values(mask):
+    """Return the possible values of mask as an ascending list.
+
+    Arguments:
+    mask -- the mask
+
+    """
+    values = []
+    while mask:
+        bit = mask & -mask
+        values.append(bit.bit_length())
+        mask ^= bit
+    return values
+
+
+class Geometry(object):
+    """Precomputed units and peers of a board.
+
+    Positions are numbered row by row, (j, i) is j * boardsize + i.
+
+    """
+    def __init__(self, cellsize):
+        """Compute the tables for a board.
+
+        Arguments:
+        cellsize -- tuple of the region width and height
+
+        """
+        width, height = cellsize
+        n = width * height
+        self.cellsize = (width, height)
+        self.boardsize = n
+        self.size = n * n
+        self.all = (1 << n) - 1
+
+        self.rows = tuple([tuple([j * n + i for i in xrange(n)])
+                           for j in xrange(n)])
+        self.columns = tuple([tuple([j * n + i for j in xrange(n)])
+                              for i in xrange(n)])
+        regions = []
+        for vini in xrange(0, n, height):
+            for hini in xrange(0, n, width):
+                regions.append(tuple([v * n + h
+                                      for v in xrange(vini, vini + height)
+                                      for h in xrange(hini, hini + width)]))
+        self.regions = tuple(regions)
+        self.units = self.rows + self.columns + self.regions
+
+        self.region_of = [0] * self.size
+        for r, region in enumerate(self.regions):
+            for k in region:
+                self.region_of[k] = r
+
+        # row, column and region peers of each position, without itself
+        self.unit_peers = []
+        self.peers = []
+        for k in xrange(self.size):
+            row = self.rows[k // n]
+            column = self.columns[k % n]
+            region = self.regions[self.region_of[k]]
+            unit_peers = tuple([tuple([p for p in unit if p != k])
+                                for unit in (row, column, region)])
+            self.unit_peers.append(unit_peers)
+            self.peers.append(tuple(sorted(set(row + column + region) -
+                                           set([k]))))
+
+        # the parts of a row/column inside a region, with the rest of the
+        # region and the rest of the row/column
+        self.segments = []
+        for region in self.regions:
+            for lines in (self.rows, self.columns):
+                for line in lines:
+                    segment = tuple([k for k in line if k in region])
+                    if not segment:
+                        continue
+                    self.segments.append(
+                        (segment,
+                         tuple([k for k in region if k not in segment]),
+                         tuple([k for k in line if k not in segment])))
+
+
+_geometries = {}
+
+def geometry(cellsize):
+    """Return the Geometry for cellsize, computed only once per size.
+
+    Arguments:
+    cellsize -- tuple of the region width and height
+
+    """
+    cellsize = tuple(cellsize)
+    if cellsize not in _geometries:
+        _geometries[cellsize] = Geometry(cellsize)
+    return _geometries[cellsize]
+
+
+class BitmaskSudoku(Sudoku):
+    """Create/resolve a sudoku with one bitmask per position.
+
+    This is the "bitmask" engine: Sudoku(board, engine="bitmask").
+    It has the same interface and algorithms as Sudoku, but the possible
+    values are one integer per position and the rows, columns and regions
+    are looked up in precomputed tables.
+
+    """
+    def __getitem__(self, (row, column)):
+        """Get the value for the (row, column) position.
+
+        Arguments:
+        (row, column) -- a tuple/list/iterable with 2 values
+
+        """
+        mask = self._masks[row * self._boardsize + column]
+        if mask and not mask & (mask - 1):
+            return mask.bit_length()
+        else:
+            return 0
+
+    def __setitem__(self, (row, column), value):
+        """Set value as the (row, column) position value.
+
+        Arguments:
+        (row, column) -- a tuple/list/iterable with 2 values
+        value -- the number
+
+        """
+        if value:
+            self._assign(row * self._boardsize + column, 1 << (value - 1))
+        elif self[row, column]:
+            self._masks[row * self._boardsize + column] = self._geometry.all
+            self._remove_change()
+
+
+    # Values initialization
+    def _initialize_possible_values(self, j, i):
+        """Initialize the position (j, i) adding all the values as possible
+        values.
+
+        Arguments:
+        j -- j coord
+        i -- i coord
+
+        """
+        self._masks[j * self._boardsize + i] = self._geometry.all
+
+    def _initialize_values(self):
+        self._geometry = geometry(self._cellsize)
+        self._peers = self._geometry.peers
+        self._masks = [self._geometry.all] * self._geometry.size
+        # unit -> masks of its unsolved positions when no subset was found
+        self._subsets_checked = {}
+
+
+    # Value substraction
+    def _assign(self, k, bit):
+        """Set bit as the only possible value of position k and remove it
+        from the peers.
+
+        Peers left with only one possible value are assigned too.
+
+        Arguments:
+        k -- the position
+        bit -- mask of the value
+
+        """
+        masks = self._masks
+        peers = self._peers
+        masks[k] = bit
+        stack = [(k, bit)]
+        while stack:
+            k, bit = stack.pop()
+            if masks[k] != bit:
+                # removed by an earlier assignment, now a hole
+                continue
+            self._number_changes += 1
+            notbit = ~bit
+            for p in peers[k]:
+                mask = masks[p]
+                if mask & bit:
+                    mask &= notbit
+                    masks[p] = mask
+                    if mask and not mask & (mask - 1):
+                        stack.append((p, mask))
+
+    def _eliminate(self, k, bits):
+        """Remove the values of bits from the possible values of k.
+
+        Arguments:
+        k -- the position
+        bits -- mask of the values
+
+        """
+        mask = self._masks[k]
+        if mask & bits:
+            mask &= ~bits
+            self._masks[k] = mask
+            if mask and not mask & (mask - 1):
+                self._assign(k, mask)
+
+    def _value_substraction(self, j, i, value):
+        """Remove value from the possible values of (j, i).
+
+        Arguments:
+        j -- j coord
+        i -- i coord
+        value -- value to remove
+
+        """
+        self._eliminate(j * self._boardsize + i, 1 << (value - 1))
+
+    def _propagate_value_substraction(self, j, i, value):
+        bit = 1 << (value - 1)
+        for p in self._peers[j * self._boardsize + i]:
+            self._eliminate(p, bit)
+
+
+    # Calculate position values
+    def possible_values(self, j, i):
+        """Return the position values for the position.
+
+        Arguments:
+        j -- j coord
+        i -- i coord
+
+        """
+        return mask_values(self._masks[j * self._boardsize + i])
+
+
+    # Sudoku solution
+    def finished(self):
+        """Return if the sudoku if finished."""
+        for mask in self._masks:
+            if not mask or mask & (mask - 1):
+                return False
+
+        return True
+
+    def solvable(self):
+        """Return if the sudoku is solvable.
+
+        This will check if the sudoku has not errors (duplicated numbers in
+        a row, etc).
+
+        """
+        masks = self._masks
+        for unit in self._geometry.units:
+            seen = 0
+            for k in unit:
+                mask = masks[k]
+                if mask and not mask & (mask - 1):
+                    if seen & mask:
+                        return False
+                    seen |= mask
+
+        return True
+
+    def _calculate_uniq_values(self):
+        """(A, B) has X as the unique value in the row/column/region, if X
+        is a possible value in the position (A, B) and in the rest of
+        row/column/region it doen't appear X as possible value.
+        In this case, X is the value of (A, B).
+
+        """
+        masks = self._masks
+        unit_peers = self._geometry.unit_peers
+        for k in xrange(self._geometry.size):
+            for peers in unit_peers[k]:
+                mask = masks[k]
+                if not mask & (mask - 1):
+                    break
+                others = 0
+                for p in peers:
+                    others |= masks[p]
+                uniq = mask & ~others
+                if uniq:
+                    self._assign(k, uniq & -uniq)
+                    break
+
+    def _remove_deductable_values(self):
+        """In a region, if a value is only possible in a row/column, it can
+        be deducted that in the rest of the row/column (ouside the region)
+        this value can't be possible (so, remove from they possible values).
+
+        """
+        masks = self._masks
+        for segment, region_rest, line_rest in self._geometry.segments:
+            inside = 0
+            for k in segment:
+                mask = masks[k]
+                if mask & (mask - 1):
+                    inside |= mask
+            if not inside:
+                continue
+            for k in region_rest:
+                inside &= ~masks[k]
+            if inside:
+                for k in line_rest:
+                    self._eliminate(k, inside)
+
+    def _unmatched_candidate_deletion(self):
+        """A given set of n cells in any particular block, row, or column
+        can only accommodate n different numbers."""
+        masks = self._masks
+        checked = self._subsets_checked
+        for u, unit in enumerate(self._geometry.units):
+            unsolved = [k for k in unit if masks[k] & (masks[k] - 1)]
+            values = tuple([masks[k] for k in unsolved])
+            if checked.get(u) == values:
+                continue
+            eliminations = subset_eliminations(values)
+            if not eliminations:
+                checked[u] = values
+            for x, bits in eliminations:
+                self._eliminate(unsolved[x], bits)
+
+
+    # Sudoku creation
+    def are_holes(self):
+        """Return if the sudoku can't be finished."""
+        return 0 in self._masks
+
+    def _give_number(self, j, i, value):
+        """Set value as the only possible value without propagating it.
+
+        Arguments:
+        j -- j coord
+        i -- i coord
+        value -- the number
+
+        """
+        self._masks[j * self._boardsize + i] = 1 << (value - 1)
+
+    def _create_numbers(self):
+        """Create a finished sudoku.
+
+        All positions will have a number.
+
+        This is a randomized backtracking search that always continues with
+        the position with less possible values, instead of filling the
+        positions in order and starting again on a contradiction. If the
+        search visits too many positions it starts again with twice the
+        limit, so an unlucky first choice doesn't take long on big boards.
+
+        """
+        self._clear_changes()
+        limit = 4 * self._geometry.size
+        while not self._fill(self._random_generator(), limit):
+            self.stats["restarts"] += 1
+            limit *= 2
+
+    def _fill(self, rand, limit):
+        """Fill the empty board by backtracking.
+
+        Return if the board was filled with less than limit assignments.
+
+        Arguments:
+        rand -- the random generator
+        limit -- the maximum number of assignments
+
+        """
+        geo = self._geometry
+        self._masks = [geo.all] * geo.size
+        # (masks before the choice, position, values not tried yet)
+        stack = []
+        assignments = 0
+        while True:
+            masks = self._masks
+            best = None
+            if 0 not in masks:
+                fewest = geo.boardsize + 1
+                for k in xrange(geo.size):
+                    mask = masks[k]
+                    if mask & (mask - 1):
+                        n = popcount(mask)
+                        if n < fewest:
+                            best = k
+                            fewest = n
+                            if n == 2:
+                                break
+                if best is None:
+                    return True
+                values = mask_values(masks[best])
+                rand.shuffle(values)
+                stack.append((masks, best, values))
+
+            # the next value to try, going back while a choice is exhausted
+            while stack and not stack[-1][2]:
+                stack.pop()
+            if not stack or assignments >= limit:
+                return False
+            masks, k, values = stack[-1]
+            if not assignments & 0xff:
+                self._check_cancelled()
+            self._masks = masks[:]
+            self._assign(k, 1 << (values.pop() - 1))
+            assignments += 1
+
+    def _create_holes(self):
+        """Create holes randomly.
+
+        After call this, only the neccesary numbers remain.
+
+        Instead of building and solving a new sudoku for every hole, the
+        positions are tried with one solver state: the givens are assigned
+        incrementally and the masks are restored from a stack of saved
+        copies (see _dig). First every position is tried once in random
+        order, then in order until no more holes can be made.
+
+        """
+        size = self._geometry.size
+        masks = self._masks
+        # the numbers of the finished sudoku, as masks
+        solution = masks[:]
+        givens = range(size)
+        self._random_generator().shuffle(givens)
+
+        while givens:
+            holes = set()
+            self._masks = [self._geometry.all] * size
+            self._dig(givens, solution, 0, len(givens), holes)
+            if not holes:
+                break
+            remaining = set(givens) - holes
+            givens = [k for k in xrange(size) if k in remaining]
+
+        # the givens without propagation, like in the list engine
+        self._masks = [self._geometry.all] * size
+        for k in givens:
+            self._masks[k] = solution[k]
+
+    def _dig(self, givens, solution, lo, hi, holes):
+        """Try to make holes in the positions givens[lo:hi].
+
+        On entry the masks have the givens outside givens[lo:hi] assigned:
+        the positions before lo that are not in holes and all positions
+        after hi. The masks are the same on return.
+
+        A position is a hole if the sudoku can be solved without it. The
+        range is split in halves: the givens of one half are assigned while
+        the other half is tried, so each given is assigned O(log N) times
+        instead of once per tried position.
+
+        Arguments:
+        givens -- the positions to try, in order
+        solution -- the masks of the finished sudoku
+        lo -- the first position of the range
+        hi -- the position after the range
+        holes -- the set where the new holes are added
+
+        """
+        saved = self._masks[:]
+        if hi - lo == 1:
+            self._check_cancelled()
+            self.stats["holes_tried"] += 1
+            self.stats["solves"] += 1
+            if self.solve():
+                holes.add(givens[lo])
+                self.stats["holes"] += 1
+        else:
+            mid = (lo + hi) // 2
+            for k in givens[mid:hi]:
+                self._assign(k, solution[k])
+            self._dig(givens, solution, lo, mid, holes)
+            self._masks = saved[:]
+            for k in givens[lo:mid]:
+                if k not in holes:
+                    self._assign(k, solution[k])
+            self._dig(givens, solution, mid, hi, holes)
+        self._masks = saved
+
+
+register_engine("bitmask", BitmaskSudoku)
@@ -5,6 +5,9 @@
 This exports:
   - Value -- board value representation.
   - Board -- a board with NxN positions.
+  - Row -- a view of a row of a board.
+  - SYMBOLS -- tuple with the symbol of every value up to MAX_VALUE.
+  - VALUES -- dict with the value of every symbol.
 
 Copyright (C) 2005-2008  Xosé Otero <xoseotero@users.sourceforge.net>
 
@@ -14,7 +17,33 @@ Modification history:
 
 """
 
-__all__ = ["Board", "Value"]
+__all__ = ["Board", "Value", "Row", "SYMBOLS", "VALUES", "MAX_VALUE"]
+
+
+from array import array
+
+
+# the biggest value with a symbol in the tables, for boards up to 6x6
+# regions
+MAX_VALUE = 36
+
+
+def _symbol(value):
+    """Return the symbol of a value: digits up to 9, then letters."""
+    if value < 10:
+        return str(value)
+    else:
+        return chr(ord('A') + value - 10)
+
+# value -> symbol
+SYMBOLS = tuple([_symbol(value) for value in xrange(MAX_VALUE + 1)])
+# symbol -> value, the letters in upper and lower case
+VALUES = dict([(symbol, value) for value, symbol in enumerate(SYMBOLS)] +
+              [(symbol.lower(), value) for value, symbol in enumerate(SYMBOLS)
+               if symbol.isalpha()])
+
+# positions of the file format: symbol right aligned in 3 columns
+_CELLS = tuple(["%3c" % symbol for symbol in SYMBOLS])
 
 
 class Value(object):
@@ -23,9 +52,14 @@ class Value(object):
     This class converts values greater than 9 to letters.
     For example, 10 = A, 11 = B, etc.
 
+    The values are immutable and the values up to MAX_VALUE are interned:
+    Value(3) and Value("3") return always the same object.
+
     """
-    def __init__(self, value):
-        """Form a value representation.
+    __slots__ = ("__value", "__str")
+
+    def __new__(cls, value):
+        """Return a value representation.
 
         value can be a integer or a letter.
         The letter representation is always a upper one.
@@ -34,20 +68,26 @@ class Value(object):
         value -- the value
 
         """
+        if isinstance(value, Value):
+            return value
+        try:
+            return _interned[value]
+        except (KeyError, TypeError):
+            pass
+
         if isinstance(value, int):
-            self.__value = value
-            self.__str = self.string()
+            pass
         elif isinstance(value, str) and len(value) == 1:
             if value.isdigit():
-                self.__value = int(value)
+                value = int(value)
             else:
-                self.__value = ord(value.upper()) - ord("A") + 10
-            self.__str = self.string()
-        elif isinstance(value, Value):
-            self.__value = value.__value
-            self.__str = value.__str
+                value = ord(value.upper()) - ord("A") + 10
         else:
             raise ValueError("unknow value %s" % str(value))
+        self = object.__new__(cls)
+        self.__value = value
+        self.__str = _symbol(value)
+        return self
 
     def __str__(self):
         """Return the string representation.
@@ -70,10 +110,20 @@ class Value(object):
 
     def string(self):
         """Return the string representation."""
-        if self.__value < 10:
-            return str(self.__value)
-        else:
-            return chr(ord('A') + self.__value - 10)
+        return _symbol(self.__value)
+
+
+def _intern(value):
+    """Return a new Value of a value in the tables."""
+    self = object.__new__(Value)
+    self._Value__value = value
+    self._Value__str = SYMBOLS[value]
+    return self
+
+# int or symbol -> Value
+_interned = dict([(value, _intern(value)) for value in xrange(MAX_VALUE + 1)])
+_interned.update([(symbol, _interned[value])
+                  for symbol, value in VALUES.items()])
 
 
 class Board(object):
@@ -126,7 +176,7 @@ class Board(object):
         (row, column) -- a tuple/list/iterable with 2 values
 
         """
-        return self.numbers[row][column]
+        return self._cells[row * self.boardsize + column]
 
     def __setitem__(self, (row, column), value):
         """Set the number to a position.
@@ -138,16 +188,53 @@ class Board(object):
         """
         if value > self.boardsize:
             raise ValueError("value > boardsize")
-        self.numbers[row][column] = value
+        self._cells[row * self.boardsize + column] = value
+
+    def _get_numbers(self):
+        """Return the rows as a list of Row views of the numbers."""
+        if self._rows is None:
+            self._rows = [Row(self._cells, j * self.boardsize, self.boardsize)
+                          for j in xrange(self.boardsize)]
+        return self._rows
+
+    numbers = property(_get_numbers, doc="list with a Row view per row")
 
 
     def clear(self):
         """Remove all values."""
-        self.numbers = []
-        for i in xrange(self.boardsize):
-            self.numbers.append([])
-            for j in xrange(self.boardsize):
-                self.numbers[i].append(0)
+        self._set_cells(array("B", [0]) * (self.boardsize ** 2))
+
+    def _set_cells(self, cells):
+        """Use cells as the numbers of the board.
+
+        Arguments:
+        cells -- an array("B") with boardsize ** 2 numbers, row by row
+
+        """
+        self._cells = cells
+        # the Row views are created when numbers is used
+        self._rows = None
+
+    def copy(self):
+        """Return a copy of the board."""
+        board = Board(self.cellsize)
+        board.filename = self.filename
+        board._set_cells(self._cells[:])
+        return board
+
+    def rows(self):
+        """Return the numbers as a list of lists, one list per row."""
+        n = self.boardsize
+        return [self._cells[j:j + n].tolist() for j in xrange(0, n * n, n)]
+
+    def tostring(self):
+        """Return the numbers as a string with one byte per position.
+
+        Two boards with the same numbers and size have the same string, so
+        it can be used to hash or compare boards.
+
+        """
+        return self._cells.tostring()
 
 
     def load_board(self, board):
@@ -160,10 +247,7 @@ class Board(object):
         self.filename = board.filename
         self.cellsize = board.cellsize
         self.boardsize = board.boardsize
-
-        for j in xrange(board.boardsize):
-            for i in xrange(board.boardsize):
-                self.numbers[j][i] = board[j, i]
+        self._set_cells(board._cells[:])
 
 
     def load(self, filename):
@@ -190,7 +274,11 @@ class Board(object):
                             raise ValueError
                     continue
                 try:
-                    row = [Value(item).integer() for item in items]
+                    # the whole row with the table, Value for other symbols
+                    try:
+                        row = map(VALUES.__getitem__, items)
+                    except KeyError:
+                        row = [Value(item).integer() for item in items]
                     array += row
                 except ValueError:
                     raise ValueError("'%s' line %d: Not a number sequence" % (filename, lineno))
@@ -214,14 +302,13 @@ class Board(object):
         """
         self.boardsize = width * height
         self.cellsize = (width, height)
-        self.clear()
 
         if self.boardsize ** 2 != len(numbers) or self.boardsize < 2:
             raise ValueError("number-sequence does not match grid size")
+        if max(numbers) > self.boardsize:
+            raise ValueError("value > boardsize")
 
-        for j in xrange(self.boardsize):
-            for i in xrange(self.boardsize):
-                self.numbers[j][i] = numbers[j * (self.boardsize) + i]
+        self._set_cells(array("B", numbers))
 
 
     def save(self, filename):
@@ -231,15 +318,86 @@ class Board(object):
         filename -- the file name
 
         """
+        n = self.boardsize
+        width, height = self.cellsize
+        if n <= MAX_VALUE:
+            cells = map(_CELLS.__getitem__, self._cells)
+        else:
+            cells = ["%3c" % str(Value(value)) for value in self._cells]
+
+        lines = ["# boardsize %d x %d\n" % self.cellsize]
+        for j in xrange(n):
+            row = cells[j * n:(j + 1) * n]
+            # the regions of a row separated with 2 spaces
+            lines.append("  ".join(["".join(row[i:i + width])
+                                    for i in xrange(0, n, width)]) + "\n")
+            if (j + 1) % height == 0 and j != n - 1:
+                lines.append("\n")
+
         f = file(filename, "w")
-        f.write("# boardsize %d x %d\n" % self.cellsize)
-        for j in xrange(self.boardsize):
-            for i in xrange(self.boardsize):
-                f.write("%3c" % str(Value(self.numbers[j][i])))
-                if i != (self.boardsize - 1):
-                    if (i + 1) % self.cellsize[0] == 0:
-                        f.write("  ")
-            f.write("\n")
-            if (j + 1) % self.cellsize[1] == 0 and j != (self.boardsize - 1):
-                f.write("\n")
+        f.write("".join(lines))
         f.close()
+
+
+class Row(object):
+    """View of a row of a board.
+
+    It reads and writes the numbers of the board without copying them, so
+    board.numbers[j][i] works like with a list of lists.
+
+    """
+    __slots__ = ("_cells", "_start", "_size")
+
+    def __init__(self, cells, start, size):
+        """Form the view.
+
+        Arguments:
+        cells -- the array with the numbers of the board
+        start -- the index of the first number of the row
+        size -- the numbers in the row
+
+        """
+        self._cells = cells
+        self._start = start
+        self._size = size
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.tolist()[i]
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("row index out of range")
+        return self._cells[self._start + i]
+
+    def __setitem__(self, i, value):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError("row index out of range")
+        self._cells[self._start + i] = value
+
+    def __iter__(self):
+        return iter(self._cells[self._start:self._start + self._size])
+
+    def __eq__(self, other):
+        if isinstance(other, (Row, list, tuple)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        if isinstance(other, (Row, list, tuple)):
+            return self.tolist() != list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.tolist())
+
+    def tolist(self):
+        """Return the numbers of the row as a list."""
+        return self._cells[self._start:self._start + self._size].tolist()
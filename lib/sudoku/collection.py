@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+"""Module with a packed binary format for puzzle collections.
+
+This exports the class:
+  - Collection -- read a collection file through mmap
+
+This exports the functions:
+  - save_collection -- write boards to a collection file
+  - append_collection -- add boards at the end of a collection file
+
+A collection file is a header followed by fixed size records, so a puzzle
+is found by its index without reading the others:
+
+  header -- "SDKC", version, region width, region height, flags and the
+            difficulty (16 bytes, padded with "\\0")
+  record -- the numbers of a board row by row and, if the flags say so,
+            the numbers of its solution
+
+Boards up to 15x15 use 4 bits per number (two numbers per byte), bigger
+boards use a byte per number.
+
+Copyright (C) 2010  Martin Thurau <martin.thurau@gmail.com>
+
+"""
+
+__all__ = ["Collection", "save_collection", "append_collection"]
+
+
+import mmap
+import os
+import struct
+from array import array
+
+from board import Board
+
+
+MAGIC = "SDKC"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBB16s")
+
+# flags of the header
+SOLUTIONS = 0x01
+
+# byte -> string with the high and the low number as bytes
+_UNPACK = [chr(b >> 4) + chr(b & 0x0f) for b in xrange(256)]
+
+
+def _packed(boardsize):
+    """Return if the numbers of a board use 4 bits."""
+    return boardsize < 16
+
+def _board_bytes(boardsize):
+    """Return the bytes of the numbers of a board.
+
+    Arguments:
+    boardsize -- the numbers in a row
+
+    """
+    if _packed(boardsize):
+        return (boardsize * boardsize + 1) // 2
+    else:
+        return boardsize * boardsize
+
+def _pack(board):
+    """Return the numbers of board as a string."""
+    data = board.tostring()
+    if not _packed(board.boardsize):
+        return data
+    numbers = array("B", data)
+    if len(numbers) % 2:
+        numbers.append(0)
+    return array("B", [(numbers[x] << 4) | numbers[x + 1]
+                       for x in xrange(0, len(numbers), 2)]).tostring()
+
+def _unpack(data, cellsize):
+    """Return a board with the numbers packed in data.
+
+    Arguments:
+    data -- the string with the numbers
+    cellsize -- tuple of the region width and height
+
+    """
+    boardsize = cellsize[0] * cellsize[1]
+    if _packed(boardsize):
+        data = "".join(map(_UNPACK.__getitem__, array("B", data)))
+    cells = array("B", data[:boardsize * boardsize])
+    if max(cells) > boardsize:
+        raise ValueError("value > boardsize")
+    board = Board(cellsize)
+    board._set_cells(cells)
+    return board
+
+
+class Collection(object):
+    """Read a collection file through mmap.
+
+    collection[index] returns the board of a record, len(collection) the
+    number of records and iterating returns all the boards.
+
+    """
+    def __init__(self, filename):
+        """Open the collection.
+
+        Arguments:
+        filename -- the file name
+
+        """
+        self.filename = filename
+        f = open(filename, "rb")
+        try:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError("%s is not a collection file" % filename)
+            (magic, version, width, height,
+             flags, difficulty) = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("%s is not a collection file" % filename)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+
+        self.cellsize = (width, height)
+        self.boardsize = width * height
+        self.difficulty = difficulty.rstrip("\0")
+        self.solutions = bool(flags & SOLUTIONS)
+        self._board_bytes = _board_bytes(self.boardsize)
+        if self.solutions:
+            self._record_bytes = 2 * self._board_bytes
+        else:
+            self._record_bytes = self._board_bytes
+        self._length = (len(self._map) - HEADER.size) // self._record_bytes
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        """Return the board of a record.
+
+        Arguments:
+        index -- the record index
+
+        """
+        return _unpack(self._record(index, 0), self.cellsize)
+
+    def __iter__(self):
+        for index in xrange(self._length):
+            yield self[index]
+
+    def _record(self, index, offset):
+        """Return the packed numbers of a record.
+
+        Arguments:
+        index -- the record index
+        offset -- 0 for the board, _board_bytes for the solution
+
+        """
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("collection index out of range")
+        start = HEADER.size + index * self._record_bytes + offset
+        return self._map[start:start + self._board_bytes]
+
+    def solution(self, index):
+        """Return the solution of a record.
+
+        Arguments:
+        index -- the record index
+
+        """
+        if not self.solutions:
+            raise ValueError("%s has no solutions" % self.filename)
+        return _unpack(self._record(index, self._board_bytes), self.cellsize)
+
+    def items(self):
+        """Return an iterator of (board, solution) tuples of all the
+        records, solution is None if the collection has no solutions."""
+        for index in xrange(self._length):
+            if self.solutions:
+                yield (self[index], self.solution(index))
+            else:
+                yield (self[index], None)
+
+    def close(self):
+        """Close the collection."""
+        self._map.close()
+
+
+def _write_records(f, boards, solutions, cellsize, with_solutions):
+    """Write the records of boards to f.
+
+    Arguments:
+    f -- the file
+    boards -- the boards
+    solutions -- the solutions or None
+    cellsize -- the region size of the collection
+    with_solutions -- if the records have a solution
+
+    """
+    count = 0
+    if solutions is None:
+        solutions = [None] * len(boards)
+    for board, solution in zip(boards, solutions):
+        if tuple(board.cellsize) != tuple(cellsize):
+            raise ValueError("board size doesn't match the collection")
+        f.write(_pack(board))
+        if with_solutions:
+            f.write(_pack(solution))
+        count += 1
+    return count
+
+def save_collection(filename, boards, solutions=None, difficulty=""):
+    """Write boards to a new collection file.
+
+    Return the number of records written.
+
+    Arguments:
+    filename -- the file name
+    boards -- a list of boards of the same size
+
+    Keyword arguments:
+    solutions -- a list with the solutions of the boards (default None)
+    difficulty -- the difficulty of the boards (default "")
+
+    """
+    if not boards:
+        raise ValueError("no boards to save")
+    if len(difficulty) > 16:
+        raise ValueError("difficulty is longer than 16 characters")
+    if solutions is not None and len(solutions) != len(boards):
+        raise ValueError("the number of solutions doesn't match the boards")
+
+    flags = 0
+    if solutions is not None:
+        flags |= SOLUTIONS
+    width, height = boards[0].cellsize
+
+    f = open(filename, "wb")
+    try:
+        f.write(HEADER.pack(MAGIC, VERSION, width, height, flags, difficulty))
+        return _write_records(f, boards, solutions, (width, height),
+                              solutions is not None)
+    finally:
+        f.close()
+
+def append_collection(filename, boards, solutions=None):
+    """Add boards at the end of a collection file.
+
+    Return the number of records written.
+
+    Arguments:
+    filename -- the file name
+    boards -- a list of boards of the size of the collection
+
+    Keyword arguments:
+    solutions -- a list with the solutions of the boards, required if the
+                 collection has solutions (default None)
+
+    """
+    collection = Collection(filename)
+    cellsize = collection.cellsize
+    with_solutions = collection.solutions
+    complete = HEADER.size + len(collection) * collection._record_bytes
+    collection.close()
+
+    if with_solutions and (solutions is None or
+                           len(solutions) != len(boards)):
+        raise ValueError("%s needs the solutions of the boards" % filename)
+
+    f = open(filename, "r+b")
+    try:
+        # drop an incomplete record of an interrupted write
+        f.truncate(complete)
+        f.seek(0, os.SEEK_END)
+        return _write_records(f, boards, solutions, cellsize, with_solutions)
+    finally:
+        f.close()
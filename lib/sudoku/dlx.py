@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""Module with an exact cover (Dancing Links) solver.
+
+This exports the class:
+  - DLX -- Knuth's Algorithm X with dancing links for a board
+
+This exports the functions:
+  - solve -- return the solved board or None
+  - count_solutions -- return the number of solutions, up to a limit
+  - has_unique_solution -- return if a board has exactly one solution
+
+A board of N = W*H numbers is the exact cover problem of N^3 candidates
+(row, column, number) and 4*N^2 constraints: every position, and every
+number in every row, column and region, exactly once. It works for any
+Board.cellsize, including rectangular regions.
+
+Copyright (C) 2010  Martin Thurau <martin.thurau@gmail.com>
+
+"""
+
+__all__ = ["DLX", "solve", "count_solutions", "has_unique_solution"]
+
+
+from board import Board
+from bitmask import geometry
+
+
+# linked lists of the empty matrix, computed once per cellsize
+_templates = {}
+
+def _template(cellsize):
+    """Return the links of the complete matrix for a board size.
+
+    Node 0 is the root, nodes 1..4*N^2 are the column headers and then
+    come 4 nodes per candidate.
+
+    Arguments:
+    cellsize -- tuple of the region width and height
+
+    """
+    if cellsize in _templates:
+        return _templates[cellsize]
+
+    geo = geometry(cellsize)
+    n = geo.boardsize
+    size = geo.size
+    ncolumns = 4 * size
+
+    left = [(i - 1) % (ncolumns + 1) for i in xrange(ncolumns + 1)]
+    right = [(i + 1) % (ncolumns + 1) for i in xrange(ncolumns + 1)]
+    up = range(ncolumns + 1)
+    down = range(ncolumns + 1)
+    column = range(ncolumns + 1)
+    row = [-1] * (ncolumns + 1)
+    count = [0] * (ncolumns + 1)
+
+    for k in xrange(size):
+        j, i = divmod(k, n)
+        region = geo.region_of[k]
+        for v in xrange(n):
+            first = len(left)
+            headers = (1 + k,
+                       1 + size + j * n + v,
+                       1 + 2 * size + i * n + v,
+                       1 + 3 * size + region * n + v)
+            for x, c in enumerate(headers):
+                node = first + x
+                left.append(first + (x - 1) % 4)
+                right.append(first + (x + 1) % 4)
+                # append at the bottom of column c
+                up.append(up[c])
+                down.append(c)
+                down[up[c]] = node
+                up[c] = node
+                column.append(c)
+                row.append(k * n + v)
+                count[c] += 1
+
+    _templates[cellsize] = (left, right, up, down, column, row, count)
+    return _templates[cellsize]
+
+
+class DLX(object):
+    """Solve a board as an exact cover problem with dancing links."""
+    def __init__(self, board):
+        """Build the matrix for board and select the given numbers.
+
+        Arguments:
+        board -- the board
+
+        """
+        self.cellsize = board.cellsize
+        self.boardsize = board.boardsize
+        (left, right, up, down,
+         column, row, count) = _template(tuple(board.cellsize))
+        self._left = left[:]
+        self._right = right[:]
+        self._up = up[:]
+        self._down = down[:]
+        self._column = column
+        self._row = row
+        self._count = count[:]
+        self._givens = []
+        self._consistent = True
+
+        n = self.boardsize
+        ncolumns = 4 * n * n
+        for j in xrange(n):
+            for i in xrange(n):
+                value = board[j, i]
+                if not value:
+                    continue
+                # first node of the candidate row
+                node = ncolumns + 1 + ((j * n + i) * n + value - 1) * 4
+                for x in xrange(4):
+                    c = column[node + x]
+                    if self._right[self._left[c]] != c:
+                        # constraint already covered: duplicated number
+                        self._consistent = False
+                        return
+                    self._cover(c)
+                self._givens.append(row[node])
+
+    def _cover(self, c):
+        """Remove column c and all the rows in it."""
+        left, right, up, down = self._left, self._right, self._up, self._down
+        column, count = self._column, self._count
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                count[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def _uncover(self, c):
+        """Put back column c and all the rows in it, undo _cover(c)."""
+        left, right, up, down = self._left, self._right, self._up, self._down
+        column, count = self._column, self._count
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                count[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+
+    def solutions(self, limit=None):
+        """Generate the solutions as lists of candidates.
+
+        A candidate is (position * N + number - 1), the position is
+        j * N + i.
+
+        Keyword arguments:
+        limit -- stop after this number of solutions (default None)
+
+        """
+        if not self._consistent:
+            return
+
+        left, right, down = self._left, self._right, self._down
+        column, row, count = self._column, self._row, self._count
+        cover, uncover = self._cover, self._uncover
+
+        found = 0
+        chosen = []
+        while True:
+            if right[0] == 0:
+                yield self._givens + [row[x] for x in chosen]
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+                r = None
+            else:
+                # choose the column with less rows
+                c = right[0]
+                best = count[c]
+                x = right[c]
+                while x != 0 and best > 1:
+                    if count[x] < best:
+                        c = x
+                        best = count[x]
+                    x = right[x]
+                cover(c)
+                r = down[c]
+
+            # r is the next row to try; when the rows of a column are
+            # exhausted (r is the header) go back to the previous choice
+            while r is None or r == column[r]:
+                if r is not None:
+                    uncover(r)
+                if not chosen:
+                    return
+                r = chosen.pop()
+                j = left[r]
+                while j != r:
+                    uncover(column[j])
+                    j = left[j]
+                r = down[r]
+
+            chosen.append(r)
+            j = right[r]
+            while j != r:
+                cover(column[j])
+                j = right[j]
+
+    def count(self, limit=2):
+        """Return the number of solutions, counting at most limit.
+
+        With the default limit of 2 it's enough to know if the solution
+        is unique.
+
+        Keyword arguments:
+        limit -- stop counting at this number (default 2, None for all)
+
+        """
+        found = 0
+        for solution in self.solutions(limit):
+            found += 1
+        return found
+
+    def solve(self):
+        """Return a board with the first solution or None."""
+        for solution in self.solutions(1):
+            return self._board(solution)
+        return None
+
+    def _board(self, solution):
+        """Return a board with the numbers of a solution.
+
+        Arguments:
+        solution -- the list of candidates
+
+        """
+        n = self.boardsize
+        numbers = [0] * (n * n)
+        for candidate in solution:
+            k, v = divmod(candidate, n)
+            numbers[k] = v + 1
+        board = Board(self.cellsize)
+        board.load_numbers(numbers, self.cellsize)
+        return board
+
+
+def solve(board):
+    """Return the solved board or None if it has no solution.
+
+    Arguments:
+    board -- the board
+
+    """
+    return DLX(board).solve()
+
+def count_solutions(board, limit=2):
+    """Return the number of solutions of board, counting at most limit.
+
+    Arguments:
+    board -- the board
+
+    Keyword arguments:
+    limit -- stop counting at this number (default 2, None for all)
+
+    """
+    return DLX(board).count(limit)
+
+def has_unique_solution(board):
+    """Return if board has exactly one solution.
+
+    Arguments:
+    board -- the board
+
+    """
+    return DLX(board).count(2) == 1
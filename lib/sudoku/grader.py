@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""Module to grade the difficulty of a sudoku in one solve.
+
+This exports the class:
+  - Grader -- solve a sudoku recording the techniques used
+
+This exports the functions:
+  - grade -- return the label, score and technique counts of a board
+
+The techniques are tried from the cheapest to the most expensive and
+after every deduction the solve starts again with the cheapest one, so
+the hardest technique used is the hardest one needed:
+  - naked single -- a position with only one possible value
+  - hidden single -- a value possible in only one position of a unit
+  - pointing -- a value of a region possible in only one row/column
+  - subset -- n positions of a unit with only n possible values
+
+The label is the same as returned by sudoku.difficulty with the "bitmask"
+engine, difficulty(board, engine="grader") uses this module: "easy" needs
+only naked singles, "normal" also hidden singles and pointing, "hard"
+also subsets, and None is a sudoku not solvable with these techniques.
+
+Copyright (C) 2010  Martin Thurau <martin.thurau@gmail.com>
+
+"""
+
+__all__ = ["Grader", "grade", "TECHNIQUES", "WEIGHTS"]
+
+
+from bitmask import BitmaskSudoku, popcount
+
+
+TECHNIQUES = ("naked single", "hidden single", "pointing", "subset")
+
+# score of every deduction: a solved position for the singles, a removed
+# possible value for pointing and subsets
+WEIGHTS = {"naked single": 1,
+           "hidden single": 2,
+           "pointing": 4,
+           "subset": 8}
+
+# hardest technique needed -> label
+LABELS = {"naked single": "easy",
+          "hidden single": "normal",
+          "pointing": "normal",
+          "subset": "hard"}
+
+
+class Grader(BitmaskSudoku):
+    """Solve a sudoku once recording the techniques used."""
+    def __init__(self, board):
+        """Create the grader of board.
+
+        Arguments:
+        board -- the board
+
+        """
+        self._technique = None
+        self.counts = dict([(technique, 0) for technique in TECHNIQUES])
+        BitmaskSudoku.__init__(self, board, "hard")
+
+    def _assign(self, k, bit):
+        if self._technique == "hidden single":
+            self.counts["hidden single"] += 1
+        BitmaskSudoku._assign(self, k, bit)
+
+    def _eliminate(self, k, bits):
+        if self._technique in ("pointing", "subset"):
+            self.counts[self._technique] += popcount(self._masks[k] & bits)
+        BitmaskSudoku._eliminate(self, k, bits)
+
+    def _solved(self):
+        """Return the number of positions with only one possible value."""
+        solved = 0
+        for mask in self._masks:
+            if mask and not mask & (mask - 1):
+                solved += 1
+        return solved
+
+    def grade(self):
+        """Solve the sudoku and return the label.
+
+        The label is None if the sudoku is not solvable with the techniques.
+        Afterwards counts has the number of deductions of every technique.
+
+        """
+        if not self.solvable():
+            return None
+
+        steps = (("hidden single", self._calculate_uniq_values),
+                 ("pointing", self._remove_deductable_values),
+                 ("subset", self._unmatched_candidate_deletion))
+        givens = self._givens
+        hardest = "naked single"
+        while not self.finished() and not self.are_holes():
+            for technique, step in steps:
+                masks = self._masks[:]
+                self._technique = technique
+                step()
+                self._technique = None
+                if masks != self._masks:
+                    if TECHNIQUES.index(technique) > \
+                       TECHNIQUES.index(hardest):
+                        hardest = technique
+                    break
+            else:
+                break
+
+        # every solved position that was not a given nor a hidden single
+        self.counts["naked single"] = (self._solved() - givens -
+                                       self.counts["hidden single"])
+        if self.finished() and self.solvable():
+            return LABELS[hardest]
+        else:
+            return None
+
+    def score(self):
+        """Return the score of the deductions made by grade()."""
+        return sum([WEIGHTS[technique] * self.counts[technique]
+                    for technique in TECHNIQUES])
+
+    def from_board(self, board):
+        BitmaskSudoku.from_board(self, board)
+        self._givens = 0
+        for j in xrange(self._boardsize):
+            for i in xrange(self._boardsize):
+                if board[j, i]:
+                    self._givens += 1
+
+
+def grade(board):
+    """Return (label, score, counts) of board.
+
+    label is "easy", "normal", "hard" or None, score is the sum of the
+    weighted deductions and counts is a dict technique -> deductions.
+
+    Arguments:
+    board -- the board
+
+    """
+    grader = Grader(board)
+    label = grader.grade()
+    return (label, grader.score(), grader.counts)
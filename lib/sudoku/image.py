@@ -2,8 +2,17 @@
 
 """Module for image output.
 
-This exports the class:
+This exports the classes:
   - Image -- Save a board as an image.
+  - Renderer -- Draw boards with the image options read only once.
+
+This exports the functions:
+  - renderer -- return the Renderer of the current image options
+  - save_many -- save a list of boards as images
+
+A Renderer reads the options, loads the font and draws the empty grid of
+a board size only once, so drawing a board only pastes the numbers on a
+copy of the grid. The numbers are drawn once too and pasted as masks.
 
 Copyright (C) 2005-2008  Xosé Otero <xoseotero@users.sourceforge.net>
 
@@ -13,24 +22,312 @@ Modification history:
 
 """
 
-__all__ = ["Image"]
+__all__ = ["Image", "Renderer", "renderer", "save_many"]
 
 
 import sys
 import os
 import re
+from cStringIO import StringIO
 
 import PIL.Image
 import PIL.ImageColor
 import PIL.ImageDraw
 import PIL.ImageFont
 
-from board import Value
-from config import options
+from board import SYMBOLS
+
+# the configuration of Python Sudoku is optional, without it the
+# defaults are used
+try:
+    from config import options
+except ImportError:
+    options = None
+
+
+# (format, width, height, background, lines_colour, font_colour, font,
+#  font_size, use_letters) without the configuration
+DEFAULT_OPTIONS = (None, 600, 600, "white", "black", "black",
+                   "DejaVuSans.ttf", 36, True)
+
+# (font, size) -> font
+_fonts = {}
+
+def _font(filename, size):
+    """Return the font, loaded only once.
+
+    Arguments:
+    filename -- the TrueType font file
+    size -- the font size
+
+    """
+    if (filename, size) not in _fonts:
+        try:
+            _fonts[filename, size] = PIL.ImageFont.truetype(filename, size)
+        except IOError:
+            # the bitmap font of PIL, the numbers are scaled to size
+            _fonts[filename, size] = PIL.ImageFont.load_default()
+    return _fonts[filename, size]
+
+def _image_options():
+    """Return a tuple with the image options, DEFAULT_OPTIONS without
+    the configuration."""
+    if options is None:
+        return DEFAULT_OPTIONS
+    return (options.get("image", "format"),
+            options.getint("image", "width"),
+            options.getint("image", "height"),
+            options.get("image", "background"),
+            options.get("image", "lines_colour"),
+            options.get("image", "font_colour"),
+            options.get("image", "font"),
+            options.getint("image", "font_size"),
+            options.getboolean("sudoku", "use_letters"))
+
+
+class Renderer(object):
+    """Draw boards with the image options read only once."""
+    def __init__(self, image_options=None):
+        """Read the options and load the font.
+
+        Keyword arguments:
+        image_options -- the tuple returned by _image_options (default
+                         None, read the options)
+
+        """
+        if image_options is None:
+            image_options = _image_options()
+        self.options = image_options
+        (self.format, self.width, self.height, self.background,
+         self.lines_colour, self.font_colour, font, font_size,
+         self.use_letters) = image_options
+        self.font = _font(font, font_size)
+        self.font_size = font_size
+
+        if not self.background:
+            self.mode = "RGBA"
+        elif self.in_greyscale(self.background) and \
+             self.in_greyscale(self.lines_colour) and \
+             self.in_greyscale(self.font_colour):
+            self.mode = "L"
+        else:
+            self.mode = "RGB"
+
+        # 5% margins
+        self.x = self.width / 20
+        self.y = self.height / 20
+
+        # cellsize -> empty grid
+        self._grids = {}
+        # number -> (mask, size)
+        self._numbers = {}
+
+    def in_greyscale(self, colour):
+        """Return if a colour is in grey scale."""
+        rgb = PIL.ImageColor.getrgb(colour)
+        return rgb[0] == rgb[1] == rgb[2]
+
+    def _square(self, boardsize):
+        """Return the (width, height) of a square, 10% is for borders.
+
+        Arguments:
+        boardsize -- the numbers in a row
+
+        """
+        return (self.width / (boardsize + 1), self.height / (boardsize + 1))
+
+    def grid(self, cellsize):
+        """Return the image of the empty board of a size.
+
+        The image is drawn only once, don't change it.
+
+        Arguments:
+        cellsize -- tuple of the region width and height
+
+        """
+        cellsize = tuple(cellsize)
+        if cellsize not in self._grids:
+            self._grids[cellsize] = self._draw_grid(cellsize)
+        return self._grids[cellsize]
+
+    def _draw_grid(self, cellsize):
+        """Draw the empty board.
+
+        Arguments:
+        cellsize -- tuple of the region width and height
+
+        """
+        im = PIL.Image.new(self.mode, (self.width, self.height),
+                           self.background)
+        draw = PIL.ImageDraw.Draw(im)
+        boardsize = cellsize[0] * cellsize[1]
+        square_width, square_height = self._square(boardsize)
+        x, y = self.x, self.y
+
+        draw.rectangle(((x, y), (self.width - x, self.height - y)),
+                       outline=self.lines_colour, fill=None)
+
+        # horizontal lines
+        for i in xrange(boardsize):
+            if i > 0 and i % cellsize[1] == 0:
+                linewidth = 2
+            else:
+                linewidth = 1
+            # PIL <= 1.1.4
+            for offset in range(linewidth):
+                draw.line(((x, y + i * square_height + offset),
+                           (self.width - x, y + i * square_height + offset)),
+                          self.lines_colour)
+
+        # vertical lines
+        for i in xrange(boardsize):
+            if i > 0 and i % cellsize[0] == 0:
+                linewidth = 2
+            else:
+                linewidth = 1
+            # PIL <= 1.1.4
+            for offset in range(linewidth):
+                draw.line(((x + i * square_width + offset, y),
+                           (x + i * square_width + offset, self.height - y)),
+                          self.lines_colour)
+        return im
+
+    def _number(self, number):
+        """Return the (mask, size) of a number, drawn only once.
+
+        Arguments:
+        number -- the number
+
+        """
+        if number not in self._numbers:
+            if self.use_letters:
+                text = SYMBOLS[number]
+            else:
+                text = str(number)
+            size = self.font.getsize(text)
+            mask = PIL.Image.new("L", size, 0)
+            PIL.ImageDraw.Draw(mask).text((0, 0), text, fill=255,
+                                          font=self.font)
+            if not isinstance(self.font, PIL.ImageFont.FreeTypeFont):
+                # the bitmap font has only one size
+                scale = max(1, self.font_size / size[1])
+                size = (size[0] * scale, size[1] * scale)
+                mask = mask.resize(size, PIL.Image.NEAREST)
+            self._numbers[number] = (mask, size)
+        return self._numbers[number]
+
+    def render(self, board):
+        """Return a new image of board.
+
+        Arguments:
+        board -- the board
+
+        """
+        im = self.grid(board.cellsize).copy()
+        self.paste_numbers(im, board.numbers, board.boardsize)
+        return im
+
+    def paste_numbers(self, im, numbers, boardsize):
+        """Paste the numbers of a board on an image of its grid.
+
+        Arguments:
+        im -- the image
+        numbers -- the numbers of the board, a list of rows
+        boardsize -- the numbers in a row
+
+        """
+        square_width, square_height = self._square(boardsize)
+        # 5% margin + half square
+        x = self.x + square_width / 2
+        y = self.y + square_height / 2
+        for j in xrange(boardsize):
+            row = numbers[j]
+            for i in xrange(boardsize):
+                if row[i] != 0:
+                    mask, size = self._number(row[i])
+                    # it's not centered without the + 2 in the y coord
+                    im.paste(self.font_colour,
+                             (x + i * square_width - size[0] / 2,
+                              y + j * square_height - size[1] / 2 + 2),
+                             mask)
+
+    def _format(self, filename):
+        """Return the image format of filename."""
+        if self.format:
+            return self.format
+        return re.sub(".*\.", "", filename)
+
+    def save(self, board, filename):
+        """Save board as an image.
+
+        Arguments:
+        board -- the board
+        filename -- the filename
+
+        """
+        self.render(board).save(filename, self._format(filename))
+
+    def tostring(self, board, format="PNG"):
+        """Return the image of board as a string.
+
+        Arguments:
+        board -- the board
+
+        Keyword arguments:
+        format -- the image format (default "PNG")
+
+        """
+        data = StringIO()
+        self.render(board).save(data, format)
+        return data.getvalue()
+
+    def save_many(self, boards, filenames):
+        """Save a list of boards as images.
+
+        Arguments:
+        boards -- the boards
+        filenames -- the filenames, one for every board
+
+        """
+        if len(boards) != len(filenames):
+            raise ValueError("the number of filenames doesn't match the boards")
+        for board, filename in zip(boards, filenames):
+            self.save(board, filename)
+
+
+# the Renderer of the last options used
+_renderer = None
+
+def renderer():
+    """Return a Renderer of the current image options.
+
+    The Renderer is created again only if the options changed.
+
+    """
+    global _renderer
+    image_options = _image_options()
+    if _renderer is None or _renderer.options != image_options:
+        _renderer = Renderer(image_options)
+    return _renderer
+
+def save_many(boards, filenames):
+    """Save a list of boards as images with the same Renderer.
+
+    Arguments:
+    boards -- the boards
+    filenames -- the filenames, one for every board
+
+    """
+    renderer().save_many(boards, filenames)
 
 
 class Image(object):
-    """Save a board as an image."""
+    """Save a board as an image.
+
+    The drawing is done by the Renderer of the current options, the
+    attributes and methods are kept for the code that draws step by step.
+
+    """
     def __init__(self, board, filename):
         """Save a board as an image.
 
@@ -43,16 +340,12 @@ class Image(object):
         self.cellsize = board.cellsize
         self.boardsize = board.boardsize
         self.filename = filename
-        if options.get("image", "format"):
-            self.format = options.get("image", "format")
-        else:
-            self.format = re.sub(".*\.", "", filename)
+        self.renderer = renderer()
+        self.format = self.renderer._format(filename)
 
         # 10% for borders
-        self.square_width = options.getint("image", "width") / \
-                            (self.boardsize + 1)
-        self.square_height = options.getint("image", "height") / \
-                             (self.boardsize + 1)
+        self.square_width, self.square_height = \
+                           self.renderer._square(self.boardsize)
 
         self.create()
 
@@ -63,22 +356,13 @@ class Image(object):
 
     def in_greyscale(self, colour):
         """Return if a colour is in grey scale."""
-        rgb = PIL.ImageColor.getrgb(colour)
-        return rgb[0] == rgb[1] == rgb[2]
+        return self.renderer.in_greyscale(colour)
 
     def create(self):
         """Create a blank image widthxheight."""
-        if not options.get("image", "background"):
-            mode = "RGBA"
-        elif self.in_greyscale(options.get("image", "background")) and \
-             self.in_greyscale(options.get("image", "lines_colour")) and \
-             self.in_greyscale(options.get("image", "font_colour")):
-            mode = "L"
-        else:
-            mode = "RGB"
-        self.im = PIL.Image.new(mode, (options.getint("image", "width"),
-                                       options.getint("image", "height")),
-                                options.get("image", "background"))
+        self.im = PIL.Image.new(self.renderer.mode,
+                                (self.renderer.width, self.renderer.height),
+                                self.renderer.background)
         self.draw = PIL.ImageDraw.Draw(self.im)
 
     def save(self):
@@ -91,79 +375,8 @@ class Image(object):
         Only the board, to draw numbers draw_numbers it is used.
 
         """
-        # margins
-        x = options.getint("image", "width") / 20 # 5% left margin
-        y = options.getint("image", "height") / 20 # 5% top margin
-
-        self.draw.rectangle(((x, y), (options.getint("image", "width") - x,
-                                      options.getint("image", "height") - y)),
-                            outline=options.get("image", "lines_colour"),
-                            fill=None)
-
-        linewidth = 0
-
-        # horizontal lines
-        for i in xrange(self.boardsize):
-            if i > 0 and i % self.cellsize[1] == 0:
-                linewidth = 2
-            else:
-                linewidth = 1
-            # PIL <= 1.1.4
-            for offset in range(linewidth):
-                self.draw.line(((x, y + i * self.square_height + offset),
-                                (options.getint("image", "width") - x,
-                                 y + i * self.square_height + offset)),
-                               options.get("image", "lines_colour"))
-            # PIL > 1.1.5
-            #self.draw.line(((x, y + i * self.square_height),
-            #                (options.getint("image", "width") - x,
-            #                 y + i * self.square_height)),
-            #               fill=options.get("image", "lines_colour"),
-            #               width=linewidth)
-
-        # vertical lines
-        for i in xrange(self.boardsize):
-            if i > 0 and i % self.cellsize[0] == 0:
-                linewidth = 2
-            else:
-                linewidth = 1
-            # PIL <= 1.1.4
-            for offset in range(linewidth):
-                self.draw.line(((x + i * self.square_width + offset, y),
-                                (x + i * self.square_width + offset,
-                                 options.getint("image", "height") - y)),
-                               options.get("image", "lines_colour"))
-            # PIL > 1.1.5
-            #self.draw.line(((x + i * self.square_width, y),
-            #                (x + i * self.square_width,
-            #                 options.getint("image", "height") - y)),
-            #               fill=options.get("image", "lines_colour"),
-            #               width=linewidth)
+        self.im.paste(self.renderer.grid(self.cellsize), (0, 0))
 
     def draw_numbers(self):
         """Draw the numbers."""
-        font = PIL.ImageFont.truetype(options.get("image", "font"),
-                                      options.getint("image", "font_size"))
-
-        # 5% margin + half square
-        x = options.getint("image", "width") / 20 + self.square_width / 2
-        y = options.getint("image", "height") / 20 + self.square_height / 2
-        for i in xrange(self.boardsize):
-            for j in xrange(self.boardsize):
-                if self.numbers[j][i] != 0:
-                    if options.getboolean("sudoku", "use_letters"):
-                        text = str(Value(self.numbers[j][i]))
-                    else:
-                        text = str(Value(self.numbers[j][i]).integer())
-                    size = self.draw.textsize(text, font=font)
-                    # this should be:
-                    #self.draw.text((x + i * self.square_width - size[0] / 2,
-                    #                y + j * self.square_height - size[1] / 2),
-                    #                text)
-                    # but it's not centered without the + 2 in the y coord
-                    self.draw.text((x + i * self.square_width - size[0] / 2,
-                                    y + j * self.square_height - size[1] / 2 +
-                                    2),
-                                   text,
-                                   fill=options.get("image", "font_colour"),
-                                   font=font)
+        self.renderer.paste_numbers(self.im, self.numbers, self.boardsize)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+"""Module with the bundled puzzle sets.
+
+This exports the functions:
+  - load_puzzles -- load a bundled puzzle set
+  - load_graded -- load the graded puzzles with their solutions
+  - grade_puzzles -- grade and solve the puzzle sets for load_graded
+
+The puzzle sets are text files in the puzzles directory, one puzzle per
+line, row by row, with "." or "0" for the empty positions. Collection
+files (.sdkc) can be given too.
+
+The graded puzzles are the puzzles of the sets by their label, saved
+with the solutions in a collection file per label (graded-<label>.sdkc),
+so they are available without grading or solving anything. Run this
+module as a script to write them again when the sets or the grader
+change:
+  python puzzles.py
+
+Copyright (C) 2010  Martin Thurau <martin.thurau@gmail.com>
+
+"""
+
+__all__ = ["PUZZLE_DIR", "PUZZLE_SETS", "LABELS", "load_puzzles",
+           "load_graded", "grade_puzzles"]
+
+
+import os
+import sys
+
+from board import Board, VALUES
+from collection import Collection, save_collection
+
+
+PUZZLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "puzzles")
+PUZZLE_SETS = ("easy", "normal", "hard", "minimum", "extreme")
+# labels of grader.grade
+LABELS = ("easy", "normal", "hard")
+
+
+def load_puzzles(name, cellsize=3):
+    """Return the boards of a bundled puzzle set.
+
+    Arguments:
+    name -- the set name (see PUZZLE_SETS), a file name or the name of
+            a collection file (.sdkc, see collection.py)
+
+    Keyword arguments:
+    cellsize -- the region size of the puzzles (default 3)
+
+    """
+    if name.endswith(".sdkc"):
+        puzzles = Collection(name)
+        boards = list(puzzles)
+        puzzles.close()
+        return boards
+
+    if os.path.exists(name):
+        filename = name
+    else:
+        filename = os.path.join(PUZZLE_DIR, name + ".txt")
+
+    boards = []
+    f = file(filename, "rU")
+    for line in f:
+        line = line.strip()
+        if not line or line[0] == "#":
+            continue
+        numbers = map(VALUES.__getitem__, line.replace(".", "0"))
+        board = Board(cellsize)
+        board.load_numbers(numbers, board.cellsize)
+        boards.append(board)
+    f.close()
+    return boards
+
+def _graded_filename(directory, label):
+    """Return the collection file of the graded puzzles of a label."""
+    return os.path.join(directory, "graded-%s.sdkc" % label)
+
+def load_graded(directory=PUZZLE_DIR):
+    """Return a dict label -> list of (board, solution) tuples with the
+    graded puzzles written by grade_puzzles.
+
+    Keyword arguments:
+    directory -- the directory of the collection files (default
+                 PUZZLE_DIR)
+
+    """
+    graded = {}
+    for label in LABELS:
+        filename = _graded_filename(directory, label)
+        if not os.path.exists(filename):
+            continue
+        collection = Collection(filename)
+        graded[label] = list(collection.items())
+        collection.close()
+    return graded
+
+def grade_puzzles(directory=PUZZLE_DIR):
+    """Grade and solve the puzzles of PUZZLE_SETS and save them by label
+    for load_graded.
+
+    Return a dict label -> number of puzzles. The puzzles are graded with
+    grader.grade, the grading of the creation with the bitmask engine.
+
+    Keyword arguments:
+    directory -- the directory of the collection files (default
+                 PUZZLE_DIR)
+
+    """
+    from grader import grade
+    from sudoku import Sudoku
+
+    boards = {}
+    solutions = {}
+    for name in PUZZLE_SETS:
+        for board in load_puzzles(name):
+            label = grade(board)[0]
+            if label is None:
+                continue
+            sudoku = Sudoku(board, label, engine="bitmask")
+            sudoku.solve()
+            boards.setdefault(label, []).append(board)
+            solutions.setdefault(label, []).append(sudoku.to_board())
+
+    counts = {}
+    for label in LABELS:
+        filename = _graded_filename(directory, label)
+        if label in boards:
+            counts[label] = save_collection(filename, boards[label],
+                                            solutions[label], label)
+        elif os.path.exists(filename):
+            os.remove(filename)
+    return counts
+
+
+def main(args):
+    for label, count in sorted(grade_puzzles().items()):
+        print "%-8s %4d" % (label, count)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""Module to find naked and hidden subsets in a unit.
+
+This exports the function:
+  - subset_eliminations -- return the values removed by the subsets
+
+A naked subset are n positions of a unit with only n possible values
+between them: the values can be removed from the rest of the unit. A
+hidden subset are n values possible only in n positions of a unit: the
+other values can be removed from these positions.
+
+A naked subset of n of the m unsolved positions is the same as a hidden
+subset of the other m - n positions, so it's enough to look for the
+naked subsets of up to m / 2 positions and the hidden subsets of less
+than m / 2 values. The search adds positions (values) while the union
+of their values (positions) is small enough, instead of trying all the
+combinations.
+
+The possible values are bitmasks like in the bitmask engine.
+
+Copyright (C) 2010  Martin Thurau <martin.thurau@gmail.com>
+
+"""
+
+__all__ = ["subset_eliminations"]
+
+
+def _count(mask):
+    """Return the number of bits of mask."""
+    return bin(mask).count("1")
+
+
+def _search(sets, limit, found):
+    """Find groups of n sets whose union has n elements.
+
+    Arguments:
+    sets -- list of (element, bitmask) of the sets that can be in a group
+    limit -- the maximum size of a group
+    found -- list where the (members, union) of the groups are appended,
+             members as a bitmask of the elements
+
+    """
+    # (next set, members, union, size) of the groups to extend
+    stack = [(0, 0, 0, 0)]
+    total = len(sets)
+    while stack:
+        start, members, union, size = stack.pop()
+        for x in xrange(start, total):
+            element, mask = sets[x]
+            joined = union | mask
+            count = bin(joined).count("1")
+            if count > limit:
+                continue
+            if count == size + 1:
+                found.append((members | element, joined))
+            elif size + 1 < limit:
+                stack.append((x + 1, members | element, joined, size + 1))
+
+def subset_eliminations(masks):
+    """Return the values removed by the naked and hidden subsets.
+
+    Return a list of (index, bits) where bits are the values to remove
+    from masks[index].
+
+    Arguments:
+    masks -- the possible values of the unsolved positions of a unit
+
+    """
+    m = len(masks)
+    if m < 3:
+        return []
+    limit = m // 2
+    eliminations = []
+    everything = (1 << m) - 1
+
+    # naked subsets: positions as bits of the members
+    found = []
+    _search([(1 << x, mask) for x, mask in enumerate(masks)
+             if _count(mask) <= limit], limit, found)
+    for members, values in found:
+        if _count(members) < 2:
+            continue
+        for x in xrange(m):
+            if not members & (1 << x) and masks[x] & values:
+                eliminations.append((x, masks[x] & values))
+
+    # hidden subsets: values as bits of the members, positions as union
+    values = 0
+    for mask in masks:
+        values |= mask
+    positions = []
+    while values:
+        bit = values & -values
+        values ^= bit
+        where = 0
+        for x in xrange(m):
+            if masks[x] & bit:
+                where |= 1 << x
+        positions.append((bit, where))
+    found = []
+    _search([(bit, where) for bit, where in positions
+             if _count(where) <= m - limit - 1], m - limit - 1, found)
+    for members, where in found:
+        if where == everything:
+            continue
+        for x in xrange(m):
+            if where & (1 << x) and masks[x] & ~members:
+                eliminations.append((x, masks[x] & ~members))
+
+    return eliminations
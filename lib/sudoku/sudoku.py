@@ -2,11 +2,13 @@
 
 """Module to create/resolve sudokus.
 
-This exports the class:
+This exports the classes:
   - Sudoku -- create/resolve a sudoku
+  - Cancelled -- raised when a creation passes its deadline or is cancelled
 
 This exports the functions:
   - difficulty -- return the difficulty of a sudoku
+  - register_engine -- make a Sudoku subclass selectable as engine
 
 Copyright (C) 2005-2008  Xosé Otero <xoseotero@users.sourceforge.net>
 
@@ -19,17 +21,58 @@ Modification history:
 
 """
 
-__all__ = ["Sudoku", "difficulty"]
+__all__ = ["Sudoku", "Cancelled", "difficulty", "register_engine"]
 
 
 import random
+import time
 
 from board import Board
+from subsets import subset_eliminations
+
+
+# Sudoku classes that can be selected with the engine argument
+engines = {}
+
+def register_engine(name, cls):
+    """Make a Sudoku subclass selectable as engine.
+
+    Arguments:
+    name -- the engine name
+    cls -- the Sudoku subclass
+
+    """
+    engines[name] = cls
+
+
+class Cancelled(Exception):
+    """The creation of a sudoku passed its deadline or was cancelled."""
+    pass
 
 
 class Sudoku(object):
     """Create/resolve a sudoku."""
-    def __init__(self, board, difficulty="normal"):
+    # the deadline (as time.time()) and the cancel event of create()
+    _deadline = None
+    _cancel = None
+    # the counters of the last create(), see create()
+    stats = None
+
+    def __new__(cls, board=None, difficulty="normal", engine=None):
+        """Return an instance of the class registered as engine.
+
+        Sudoku(board, engine="bitmask") returns a BitmaskSudoku, for
+        example. Without engine the class itself is used.
+
+        """
+        if engine is not None and cls is Sudoku:
+            try:
+                cls = engines[engine]
+            except KeyError:
+                raise ValueError("unknow engine %s" % str(engine))
+        return object.__new__(cls)
+
+    def __init__(self, board, difficulty="normal", engine=None):
         """Create a sudoku with the board.
 
         Possible values to all positions will be calculated.
@@ -40,6 +83,8 @@ class Sudoku(object):
         Keyword arguments:
         difficulty -- the sudoku difficulty ("easy", "normal" or "hard")
                       ("normal" is the default)
+        engine -- the name of the candidate engine, see register_engine
+                  (default None, the list based engine of this class)
 
         """
         self._clear_changes()
@@ -573,138 +618,43 @@ class Sudoku(object):
         """A given set of n cells in any particular block, row, or column
         can only accommodate n different numbers."""
         # Internal functions
-        def combination(n, r):
-            if r == 1:
-                for i in n:
-                    yield [i]
-            else:
-                for i in xrange(len(n) - r + 1):
-                    for vs in combination(n[i + 1:], r - 1):
-                        vs.insert(0, n[i])
-                        yield vs
-
-        def possible(combination):
-            """Return if some values can be found in the combination.
-
-            This check if each position has more possible values than
-            possitions has the combination.
-
-            """
-            lenght = len(combination)
-            for c in combination:
-                if len(self._possible_values[c[0]][c[1]]) > lenght:
-                    return False
-            return True
-
-        def addition(combination):
-            ret = []
-            for c in combination:
-                ret.extend(self._possible_values[c[0]][c[1]])
-            return ret
-
-        def uniq(s):
-            ret = []
-            for i in s:
-                if not i in ret:
-                    ret.append(i)
-            return ret
-
-        def horizontal(j):
-            # Internal functions
-            def unsolved_positions():
-                unsolved = []
-                for i in xrange(self._boardsize):
-                    if len(self._possible_values[j][i]) > 1:
-                        unsolved.append((j, i))
-                return unsolved
-
-            def remove(combination, values):
-                for i in xrange(self._boardsize):
-                    if (j, i) not in combination:
-                        for value in values:
-                            self._value_substraction(j, i, value)
-
-
-            # Function code
-            unsolved = unsolved_positions()
-            for x in xrange(len(unsolved) - 1, 1, -1):
-                for c in combination(unsolved, x):
-                    if possible(c):
-                        values = uniq(addition(c))
-                        if len(values) == x:
-                            remove(c, values)
-
-
-        def vertical(i):
-            # Internal functions
-            def unsolved_positions():
-                unsolved = []
-                for j in xrange(self._boardsize):
-                    if len(self._possible_values[j][i]) > 1:
-                        unsolved.append((j, i))
-                return unsolved
-
-            def remove(combination, values):
-                for j in xrange(self._boardsize):
-                    if (j, i) not in combination:
-                        for value in values:
-                            self._value_substraction(j, i, value)
-
-
-            # Function code
-            unsolved = unsolved_positions()
-            for x in xrange(len(unsolved) - 1, 1, -1):
-                for c in combination(unsolved, x):
-                    values = uniq(addition(c))
-                    if len(values) == x:
-                        remove(c, values)
-
-
-        def region(j, i):
-            hini, hmax = self._region_horizontal_limits(j, i)
-            vini, vmax = self._region_vertical_limits(j, i)
+        def mask(j, i):
+            """Return the possible values of (j, i) as a bitmask."""
+            bits = 0
+            for value in self._possible_values[j][i]:
+                bits |= 1 << (value - 1)
+            return bits
 
-            # Internal functions
-            def unsolved_positions():
-                unsolved = []
-                for j in xrange(vini, vmax):
-                    for i in xrange(hini, hmax):
-                        if len(self._possible_values[j][i]) > 1:
-                            unsolved.append((j, i))
-                return unsolved
-
-            def addition(combination):                
-                ret = []
-                for c in combination:
-                    ret.extend(self._possible_values[c[0]][c[1]])
-                return ret
-
-            def remove(combination, values):
-                for v in xrange(vini, vmax):
-                    for h in xrange(hini, hmax):
-                        if (v, h) not in combination:
-                            for value in values:
-                                self._value_substraction(v, h, value)
+        def unit(positions):
+            """Remove the values of the subsets of the positions.
 
+            Arguments:
+            positions -- the (j, i) positions of the row/column/region
 
-            # Function code
-            unsolved = unsolved_positions()
-            for x in xrange(len(unsolved) - 1, 1, -1):
-                for c in combination(unsolved, x):
-                    if possible(c):
-                        values = uniq(addition(c))
-                        if len(values) == x:
-                            remove(c, values)
+            """
+            unsolved = [(j, i) for j, i in positions
+                        if len(self._possible_values[j][i]) > 1]
+            eliminations = subset_eliminations([mask(j, i)
+                                                for j, i in unsolved])
+            for x, bits in eliminations:
+                j, i = unsolved[x]
+                for value in xrange(1, self._boardsize + 1):
+                    if bits & (1 << (value - 1)):
+                        self._value_substraction(j, i, value)
 
 
         # Function code
-        for j in xrange(self._boardsize):
-            horizontal(j)
-        for i in xrange(self._boardsize):
-            vertical(i)
-        for j in xrange(0, self._boardsize, self._cellsize[1]):
-            for i in xrange(0, self._boardsize, self._cellsize[0]):
-                region(j, i)
+        n = self._boardsize
+        for j in xrange(n):
+            unit([(j, i) for i in xrange(n)])
+        for i in xrange(n):
+            unit([(j, i) for j in xrange(n)])
+        for j in xrange(0, n, self._cellsize[1]):
+            for i in xrange(0, n, self._cellsize[0]):
+                hini, hmax = self._region_horizontal_limits(j, i)
+                vini, vmax = self._region_vertical_limits(j, i)
+                unit([(v, h) for v in xrange(vini, vmax)
+                      for h in xrange(hini, hmax)])
 
 
     def __algorithms(self):
@@ -738,136 +688,241 @@ class Sudoku(object):
         return False
 
 
-    def give_numbers(self, solved, how_many):
+    def _check_cancelled(self):
+        """Raise Cancelled if the deadline of create() passed or the
+        creation was cancelled."""
+        if self._deadline is not None and time.time() > self._deadline:
+            raise Cancelled("the deadline to create the sudoku passed")
+        if self._cancel is not None and self._cancel.is_set():
+            raise Cancelled("the creation of the sudoku was cancelled")
+
+    def _random_generator(self, seed=None):
+        """Return the random generator of the sudoku.
+
+        A new generator is created if seed is given or if there is no one
+        yet. The generator is private to the sudoku, so the global random
+        module is never used.
+
+        Keyword arguments:
+        seed -- the seed of the new generator (default None, seed from the
+                system)
+
+        """
+        if seed is not None or getattr(self, "_random", None) is None:
+            self._random = random.Random(seed)
+        return self._random
+
+    def give_numbers(self, solved, how_many, seed=None):
         """Add extra numbers to the sudoku.
 
         Arguments:
         solved -- the board solved
         how_many -- the numbers of numbers to add.
 
+        Keyword arguments:
+        seed -- the seed of the random generator (default None, continue
+                with the generator of create() or seed from the system)
+
         """
+        rand = self._random_generator(seed)
         while how_many > 0 and not self.finished():
-            i = random.randint(0, self._boardsize - 1)
-            j = random.randint(0, self._boardsize - 1)
-            if len(self._possible_values[j][i]) == 1:
+            i = rand.randint(0, self._boardsize - 1)
+            j = rand.randint(0, self._boardsize - 1)
+            if self[j, i]:
                 continue
 
-            self._possible_values[j][i] = [solved[j, i]]
+            self._give_number(j, i, solved[j, i])
             how_many -= 1
 
-    def create(self, handicap=0):
-        """Create a new sudoku with handicap.
-
-        The handicap are the extra numbers given.
+    def _give_number(self, j, i, value):
+        """Set value as the only possible value without propagating it.
 
-        Keyword arguments:
-        handicap -- the handicap (default 0)
+        Arguments:
+        j -- j coord
+        i -- i coord
+        value -- the number
 
         """
-        # Internal functions
-        def create_sudoku_position(j, i):
-            """Try to set a number in the position.
+        self._possible_values[j][i] = [value]
 
-            Only if the possible values are equal to value this will work.
-
-            Arguments:
-            j -- j coord
-            i -- i coord
+    def _create_hole(self, j, i):
+        """Create a hole if it is possible in the position (j, i).
 
-            """
-            if len(self._possible_values[j][i]) <= 1:
-                return
+        Arguments:
+        j -- j coord
+        i -- i coord
 
-            self[j, i] = random.choice(self._possible_values[j][i])
+        """
+        if not self[j, i]:
+            return
 
-            if self.are_holes():
-                self[j, i] = 0
-            else:
-                self.__algorithms()
+        self._check_cancelled()
+        self.stats["holes_tried"] += 1
+        self.stats["solves"] += 1
+        board = self.to_board()
+        board[j, i] = 0
+        if self.__class__(board, self._difficulty).solve():
+            self[j, i] = 0
+            self.stats["holes"] += 1
 
-        def create_numbers():
-            """Create a finished sudoku.
+    def _create_holes(self):
+        """Create holes randomly.
 
-            All positions will have a number.
+        After call this, only the neccesary numbers remain.
 
-            """
-            self._clear_changes()
-            self._initialize_values()
+        """
+        rand = self._random_generator()
+        for i in xrange(0, self._boardsize ** 2):
+            self._create_hole(rand.randint(0, self._boardsize - 1),
+                              rand.randint(0, self._boardsize - 1))
 
-            while True:
-                changes = -1
-                while changes != self._changes():
-                    changes = self._changes()
+        changes = -1
+        while changes != self._changes():
+            changes = self._changes()
 
-                    for j in xrange(self._boardsize):
-                        for i in xrange(self._boardsize):
-                            if not self[j, i]:
-                                create_sudoku_position(j, i)
+            for j in xrange(self._boardsize):
+                for i in xrange(self._boardsize):
+                    self._create_hole(j, i)
 
-                if self.finished():
-                    break
+    def _create_sudoku_position(self, j, i):
+        """Try to set a number in the position.
 
-                self._clear_changes()
-                self._initialize_values()
+        Only if the possible values are equal to value this will work.
 
-        def create_hole(j, i):
-            """Create if it is possible in the position (j, i).
+        Arguments:
+        j -- j coord
+        i -- i coord
 
-            Arguments:
-            j -- j coord
-            i -- i coord
+        """
+        if len(self.possible_values(j, i)) <= 1:
+            return
 
-            """
-            if not self[j, i]:
-                return
+        self._check_cancelled()
+        self[j, i] = self._random_generator().choice(
+            self.possible_values(j, i))
 
-            board = self.to_board()
-            board[j, i] = 0
-            if Sudoku(board, self._difficulty).solve():
-                self[j, i] = 0
+        if self.are_holes():
+            self[j, i] = 0
+        else:
+            self.__algorithms()
 
-        def create_holes():
-            """Create holes randomly.
+    def _create_numbers(self):
+        """Create a finished sudoku.
 
-            After call this, only the neccesary numbers remain.
+        All positions will have a number.
 
-            """
-            for i in xrange(0, self._boardsize ** 2):
-                create_hole(random.randint(0, self._boardsize - 1),
-                            random.randint(0, self._boardsize - 1))
+        """
+        self._clear_changes()
+        self._initialize_values()
 
+        while True:
             changes = -1
             while changes != self._changes():
                 changes = self._changes()
 
                 for j in xrange(self._boardsize):
                     for i in xrange(self._boardsize):
-                        create_hole(j, i)
+                        if not self[j, i]:
+                            self._create_sudoku_position(j, i)
 
+            if self.finished():
+                break
 
-        # Function code
-        create_numbers()
+            self.stats["restarts"] += 1
+            self._clear_changes()
+            self._initialize_values()
+
+    def create(self, handicap=0, seed=None, deadline=None, cancel=None):
+        """Create a new sudoku with handicap.
+
+        The handicap are the extra numbers given. The same seed, difficulty
+        and board size always create the same sudoku.
 
+        The creation has no upper bound on its time, so it can be given a
+        deadline and/or an event to cancel it from another thread. Both
+        are checked while the numbers are filled and the holes are made,
+        and Cancelled is raised when the deadline passes or the event is
+        set. The sudoku is unusable after that.
+
+        Afterwards stats is a dict with the counters of the creation:
+          restarts -- the times the filling of the numbers started again
+          holes_tried -- the positions tried as holes
+          holes -- the holes made
+          solves -- the times the solver was used
+          fill_seconds -- the time to fill the numbers
+          holes_seconds -- the time to make the holes
+          seconds -- the total time
+
+        Keyword arguments:
+        handicap -- the handicap (default 0)
+        seed -- the seed of the random generator (default None, seed from
+                the system)
+        deadline -- the time, as returned by time.time(), when to stop
+                    (default None, no deadline)
+        cancel -- a threading.Event that stops the creation when set
+                  (default None)
+
+        """
+        self._random_generator(seed)
+        self._deadline = deadline
+        self._cancel = cancel
+        self.stats = {"restarts": 0, "holes_tried": 0, "holes": 0,
+                      "solves": 0, "fill_seconds": 0.0,
+                      "holes_seconds": 0.0, "seconds": 0.0}
+        start = time.time()
+        try:
+            self._create_numbers()
+            filled = time.time()
+            self.stats["fill_seconds"] = filled - start
+
+            self._solution = self.to_board()
+            self._create_holes()
+            self.stats["holes_seconds"] = time.time() - filled
+        finally:
+            self.stats["seconds"] = time.time() - start
+            self._deadline = None
+            self._cancel = None
         if handicap:
-            solved = self.to_board()
-            create_holes()
-            self.give_numbers(solved, handicap)
-        else:
-            create_holes()
+            self.give_numbers(self._solution, handicap)
+
+    def solution(self):
+        """Return a board with the solution of the created sudoku.
 
+        The solution is the board filled by create(), so no solver is needed.
+        None is returned if the sudoku was not created with create().
 
-def difficulty(board):
+        """
+        return getattr(self, "_solution", None)
+
+
+register_engine("list", Sudoku)
+
+
+def difficulty(board, engine=None):
     """Return the difficulty of a sudoku.
 
     The difficulty returned can be "easy", "normal", "hard" or None for
     sudokus not solvable (bad sudokus or too difficult for Python Sudoku).
 
+    The sudoku is solved with every difficulty until it's solved. With
+    the engine "grader" it's solved only once by grader.Grader instead,
+    which gives the labels of the "bitmask" engine; the default "list"
+    engine grades a few sudokus harder.
+
     Arguments:
     board -- the board
 
+    Keyword arguments:
+    engine -- the name of the candidate engine or "grader" (default None,
+              the "list" engine)
+
     """
+    if engine == "grader":
+        from grader import grade
+        return grade(board)[0]
+
     for difficulty in ("easy", "normal", "hard"):
-        sudoku = Sudoku(board, difficulty)
+        sudoku = Sudoku(board, difficulty, engine)
         if sudoku.solve():
             return difficulty
     return None
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+
+"""Module with the symmetry transformations of sudokus.
+
+This exports the class:
+  - Transform -- a relabeling of the numbers and permutation of positions
+
+This exports the functions:
+  - random_transform -- return a random Transform for a board size
+  - variants -- generate transformed copies of a board
+  - canonical -- return the same string for all the transformed copies
+
+A transformation keeps a sudoku valid, with the same number of solutions
+and the same difficulty: the numbers are relabeled, the rows are permuted
+inside their band and the bands between them, the columns inside their
+stack and the stacks between them, and boards with square regions can be
+transposed too.
+
+Copyright (C) 2010  Martin Thurau <martin.thurau@gmail.com>
+
+"""
+
+__all__ = ["Transform", "random_transform", "variants", "canonical"]
+
+
+import random
+from array import array
+from itertools import permutations, product
+from operator import itemgetter
+from string import maketrans
+
+from board import Board
+
+
+def _lines(groups, size, order, inner):
+    """Return the permuted lines of a board.
+
+    Arguments:
+    groups -- the number of bands/stacks
+    size -- the lines in a band/stack
+    order -- the new order of the bands/stacks
+    inner -- the new order of the lines inside every band/stack
+
+    """
+    return [order[g] * size + inner[order[g]][x]
+            for g in xrange(groups) for x in xrange(size)]
+
+
+class Transform(object):
+    """A symmetry transformation of a board size."""
+    def __init__(self, cellsize, numbers, bands, rows, stacks, columns,
+                 transpose=False):
+        """Form the transformation.
+
+        Arguments:
+        cellsize -- tuple of the region width and height
+        numbers -- the new number of every number (numbers[0] is the new 1)
+        bands -- the new order of the bands
+        rows -- the new order of the rows of every band
+        stacks -- the new order of the stacks
+        columns -- the new order of the columns of every stack
+
+        Keyword arguments:
+        transpose -- exchange rows and columns, only with square regions
+                     (default False)
+
+        """
+        width, height = cellsize
+        if transpose and width != height:
+            raise ValueError("only square regions can be transposed")
+        n = width * height
+        self.cellsize = (width, height)
+
+        # 0 is always an empty position
+        table = [chr(0)] + [chr(number) for number in numbers]
+        self._table = maketrans("".join([chr(v) for v in xrange(n + 1)]),
+                                "".join(table))
+
+        source_rows = _lines(width, height, bands, rows)
+        source_columns = _lines(height, width, stacks, columns)
+        if transpose:
+            source = [source_rows[i] * n + source_columns[j]
+                      for j in xrange(n) for i in xrange(n)]
+        else:
+            source = [source_rows[j] * n + source_columns[i]
+                      for j in xrange(n) for i in xrange(n)]
+        self._positions = itemgetter(*source)
+
+    def apply(self, board):
+        """Return a transformed copy of board.
+
+        Arguments:
+        board -- the board, with the size of the transformation
+
+        """
+        if tuple(board.cellsize) != self.cellsize:
+            raise ValueError("board size doesn't match the transformation")
+        data = board.tostring().translate(self._table)
+        result = Board(self.cellsize)
+        result._set_cells(array("B", "".join(self._positions(data))))
+        return result
+
+    def apply_numbers(self, numbers):
+        """Return a transformed copy of a list of rows.
+
+        Arguments:
+        numbers -- a list with a list of numbers per row
+
+        """
+        board = Board(self.cellsize)
+        board.load_numbers([number for row in numbers for number in row],
+                           self.cellsize)
+        return self.apply(board).rows()
+
+
+def random_transform(cellsize, rand=None):
+    """Return a random transformation for a board size.
+
+    Arguments:
+    cellsize -- integer or tuple of the region width and height
+
+    Keyword arguments:
+    rand -- the random generator (default None, the random module)
+
+    """
+    if rand is None:
+        rand = random
+    if isinstance(cellsize, int):
+        cellsize = (cellsize, cellsize)
+    width, height = cellsize
+    n = width * height
+
+    def shuffled(size):
+        order = range(size)
+        rand.shuffle(order)
+        return order
+
+    numbers = [number + 1 for number in shuffled(n)]
+    return Transform(cellsize, numbers,
+                     shuffled(width), [shuffled(height) for x in xrange(width)],
+                     shuffled(height), [shuffled(width) for x in xrange(height)],
+                     width == height and rand.random() < 0.5)
+
+def variants(board, count, seed=None):
+    """Generate count transformed copies of board.
+
+    Arguments:
+    board -- the board
+    count -- the number of copies
+
+    Keyword arguments:
+    seed -- the seed of the random generator (default None)
+
+    """
+    rand = random.Random(seed)
+    for x in xrange(count):
+        yield random_transform(board.cellsize, rand).apply(board)
+
+# cellsize -> all the column orders
+_orders = {}
+
+def _column_orders(cellsize):
+    """Return all the orders of the columns of a board size.
+
+    Arguments:
+    cellsize -- tuple of the region width and height
+
+    """
+    if cellsize not in _orders:
+        width, height = cellsize
+        inner = list(permutations(range(width)))
+        _orders[cellsize] = [tuple(_lines(height, width, stacks, columns))
+                             for stacks in permutations(range(height))
+                             for columns in product(inner, repeat=height)]
+    return _orders[cellsize]
+
+def canonical(board):
+    """Return the canonical form of board as a string.
+
+    All the transformed copies of a board have the same canonical form:
+    the smallest of all the copies, row by row, with the numbers relabeled
+    in the order they appear and the empty positions before the numbers.
+    The rows are chosen one by one, keeping only the copies that are the
+    smallest so far, so most of the transformations are never tried.
+
+    Only boards up to 9x9 are supported, bigger boards have too many
+    column orders.
+
+    Arguments:
+    board -- the board
+
+    """
+    width, height = board.cellsize
+    n = width * height
+    if n > 9:
+        raise ValueError("canonical forms are only supported up to 9x9")
+    rows = board.rows()
+    grids = [rows]
+    if width == height:
+        grids.append([list(column) for column in zip(*rows)])
+
+    # (grid, rows used, column order, relabeling, last label)
+    states = [(grid, (), order, [0] * (n + 1), 0)
+              for grid in grids for order in _column_orders((width, height))]
+    result = []
+    for r in xrange(n):
+        best = None
+        chosen = []
+        for grid, used, order, labels, last in states:
+            if r % height:
+                band = used[-1] // height * height
+                sources = [j for j in xrange(band, band + height)
+                           if j not in used]
+            else:
+                bands = [j // height for j in used]
+                sources = [j for j in xrange(n) if j // height not in bands]
+            for j in sources:
+                line = grid[j]
+                relabeled = labels[:]
+                label = last
+                row = []
+                # stop as soon as the row is bigger than the best one
+                smaller = best is None
+                for i in order:
+                    number = line[i]
+                    if number:
+                        if not relabeled[number]:
+                            label += 1
+                            relabeled[number] = label
+                        number = relabeled[number]
+                    if not smaller:
+                        other = best[len(row)]
+                        if number > other:
+                            break
+                        smaller = number < other
+                    row.append(number)
+                else:
+                    if smaller:
+                        best = row
+                        chosen = []
+                    chosen.append((grid, used + (j,), order, relabeled, label))
+        result.extend(best)
+        states = chosen
+    return "".join([chr(number) for number in result])
@@ -17,16 +17,94 @@
 # LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
 from copy import deepcopy
 from hashlib import md5
-from odf import table, text
-from sudoku import Sudoku, Board
+from multiprocessing import Pool, cpu_count
+from tempfile import mkstemp
+from odf import table, text, draw
+from sudoku import Sudoku, Board, Cancelled
+from sudoku.transform import random_transform, canonical
+from sudoku.puzzles import load_graded
+
+import logging
+log = logging.getLogger('mensaplan.sudoku')
 
 tmp = None
 
+# präfixe der tabellennamen für sudokus und deren lösungen
+SUDOKU_PREFIX = "Sudoku"
+SOLUTION_PREFIX = "Solution"
+
+# schwierigkeitsgrade der sudokus eines mensaplans (in umgekehrter reihenfolge)
+DIFFICULTY = ["normal", "easy", "normal", "easy"]
+
+# größe der eingebetteten sudoku-bilder (siehe embed_sudoku_image)
+IMAGE_SIZE = "6cm"
+# anhang an den hash für das bild der lösung
+SOLUTION_SUFFIX = "-solution"
+# anzahl der bilder, die im speicher gehalten werden (siehe sudoku_png)
+IMAGES = 16
+
+# anzahl der zuletzt erzeugten sudokus je schwierigkeitsgrad, die als ersatz
+# bei einer zeitüberschreitung dienen
+RECENT = 10
+# anzahl der sudokus mit seed, die im speicher gehalten werden (siehe MySudoku)
+GENERATED = 64
+
 class SudokufillerException(Exception):
 	pass
 
+class _LRUCache(object):
+	'''Ein dict mit höchstens size Einträgen. Ist es voll, wird der am längsten
+	nicht verwendete Eintrag verdrängt. Die Zugriffe sind durch ein Lock
+	geschützt, da z.B. SudokuPool im Hintergrund Sudokus erzeugt.'''
+
+	def __init__(self, size):
+		self.size = size
+		self._items = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key, default=None):
+		'''Gibt den Eintrag zu key zurück, default wenn es keinen gibt'''
+		self._lock.acquire()
+		try:
+			if key not in self._items:
+				return default
+			# ans ende verschieben, zuletzt verwendet
+			value = self._items.pop(key)
+			self._items[key] = value
+			return value
+		finally:
+			self._lock.release()
+
+	def put(self, key, value):
+		'''Speichert einen Eintrag und verdrängt ggf. den ältesten'''
+		self._lock.acquire()
+		try:
+			self._items.pop(key, None)
+			self._items[key] = value
+			while len(self._items) > self.size:
+				self._items.popitem(last=False)
+		finally:
+			self._lock.release()
+
+	def clear(self):
+		'''Entfernt alle Einträge'''
+		self._lock.acquire()
+		try:
+			self._items.clear()
+		finally:
+			self._lock.release()
+
+	def __len__(self):
+		return len(self._items)
+
 class SudokuFiller:
 	'''Füllt eine Tabelle in einem  OpenDocument ODT Dokument mit einem Sudoku.
 	Die Klasse verwendet dazu odfpy und einen teil von pythonsudoku.
@@ -99,27 +177,328 @@ class SudokuFiller:
 
 		return self.doc
 
+class GeneratorStats(object):
+	'''Zählt das Erzeugen von Sudokus je Schwierigkeitsgrad, um die Mischung der
+	Schwierigkeitsgrade und die Größe des Vorrats an echten Zahlen auszurichten.
+
+	Summiert werden die Zähler von Sudoku.create (Neustarts, versuchte und
+	gemachte Löcher, Aufrufe des Lösers, Zeit je Phase) der erzeugten Sudokus
+	sowie die Anzahl der erzeugten und der wegen einer Zeitüberschreitung
+	ersetzten Sudokus. Die Zeit der abgebrochenen Versuche wird getrennt in
+	"replaced_seconds" gezählt, sonst würde sie die Rate der erzeugten Sudokus
+	verfälschen.'''
+
+	# die zähler von Sudoku.create
+	COUNTERS = ("restarts", "holes_tried", "holes", "solves",
+				"fill_seconds", "holes_seconds", "seconds")
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self.reset()
+
+	def reset(self):
+		'''Setzt alle Zähler zurück'''
+		self._lock.acquire()
+		try:
+			self.started = time.time()
+			self._difficulties = {}
+		finally:
+			self._lock.release()
+
+	def record(self, difficulty, stats, replaced=False):
+		'''Zählt ein erzeugtes Sudoku.
+
+		Parameter:
+			difficulty		der Schwierigkeitsgrad
+			stats			die Zähler von Sudoku.create, bei None (Sudoku aus dem
+							Cache) wird nichts gezählt
+			replaced		(optional) ob das Sudoku nach einer Zeitüberschreitung
+							ersetzt wurde, stats sind dann die Zähler des
+							abgebrochenen Versuchs, von denen nur die Zeit in
+							"replaced_seconds" gezählt wird'''
+		if stats is None:
+			return
+		self._lock.acquire()
+		try:
+			if difficulty not in self._difficulties:
+				counters = dict([(name, 0) for name in self.COUNTERS])
+				counters.update(puzzles=0, replaced=0, replaced_seconds=0.0,
+								max_seconds=0.0)
+				self._difficulties[difficulty] = counters
+			counters = self._difficulties[difficulty]
+			if replaced:
+				# abgebrochener versuch, nur die zeit zählen
+				counters["replaced"] += 1
+				counters["replaced_seconds"] += stats["seconds"]
+				return
+			for name in self.COUNTERS:
+				counters[name] += stats[name]
+			counters["puzzles"] += 1
+			counters["max_seconds"] = max(counters["max_seconds"], stats["seconds"])
+		finally:
+			self._lock.release()
+
+	def snapshot(self):
+		'''Gibt die Zähler zurück.
+
+		Rückgabe:			ein dict mit "uptime" (Sekunden seit reset), den Summen
+							"puzzles", "seconds" (Rechenzeit der erzeugten Sudokus),
+							"puzzles_per_second" (erzeugte Sudokus je Sekunde dieser
+							Rechenzeit), "replaced" und "replaced_seconds" (Rechenzeit
+							der abgebrochenen Versuche) sowie unter "difficulties"
+							den Zählern je Schwierigkeitsgrad'''
+		self._lock.acquire()
+		try:
+			difficulties = {}
+			for difficulty, counters in self._difficulties.items():
+				counters = dict(counters)
+				counters["puzzles_per_second"] = _rate(counters["puzzles"], counters["seconds"])
+				difficulties[difficulty] = counters
+		finally:
+			self._lock.release()
+
+		puzzles = sum([c["puzzles"] for c in difficulties.values()])
+		seconds = sum([c["seconds"] for c in difficulties.values()])
+		return {"uptime": time.time() - self.started,
+				"puzzles": puzzles,
+				"replaced": sum([c["replaced"] for c in difficulties.values()]),
+				"replaced_seconds": sum([c["replaced_seconds"] for c in difficulties.values()]),
+				"seconds": seconds,
+				"puzzles_per_second": _rate(puzzles, seconds),
+				"difficulties": difficulties}
+
+	def dump(self, filename, **extra):
+		'''Schreibt die Zähler als JSON in eine Datei. Die Datei wird unter einem
+		temporären Namen geschrieben und dann umbenannt, ein Leser sieht also nie
+		eine halbe Datei.
+
+		Parameter:
+			filename		der Dateiname
+			extra			(optional) weitere Einträge, z.B. pool=SudokuPool.health()'''
+		data = self.snapshot()
+		data.update(extra)
+		fd, tmpname = mkstemp(dir=os.path.dirname(os.path.abspath(filename)),
+							suffix='.tmp')
+		try:
+			f = os.fdopen(fd, 'w')
+			json.dump(data, f, indent=2, sort_keys=True)
+			f.close()
+			os.rename(tmpname, filename)
+		except:
+			os.remove(tmpname)
+			raise
+
+def _rate(count, seconds):
+	'''Gibt count / seconds zurück, 0 wenn seconds 0 ist'''
+	if not seconds:
+		return 0.0
+	return count / seconds
+
+# die zähler aller in diesem prozess erzeugten sudokus
+generator_stats = GeneratorStats()
+
 class MySudoku(object):
 	'''Erzeugt ein zufälliges Sudoku samt Lösung'''
 
-	def __init__(self, difficulty):
-		# sudoku erzeugen
-		sudoku = Sudoku(Board(3), difficulty)
-		sudoku.create()
-		board = sudoku.to_board()
-		self.sudoku = deepcopy(board.numbers)
-
-		# lösung erzeugen
-		solved = Sudoku(board)
-		solved.solve()
-		self.solution = deepcopy(solved.to_board().numbers)
-
-		# hash des boards berechnen
-		m = md5()
-		for row in self.sudoku:
-				for num in row:
-						m.update(str(num))
-		self.hash = m.hexdigest()
+	# zuletzt mit seed erzeugte sudokus: (seed, schwierigkeitsgrad, cellsize) ->
+	# (sudoku, lösung), begrenzt da generate_many für jedes sudoku einen seed wählt
+	_generated = _LRUCache(GENERATED)
+	# zuletzt erzeugte sudokus: schwierigkeitsgrad -> liste mit (sudoku, lösung)
+	_recent = {}
+	# mitgelieferte sudokus: schwierigkeitsgrad -> liste mit (sudoku, lösung)
+	_bundled = None
+
+	def __init__(self, difficulty, seed=None, timeout=None, cancel=None, fallback=None):
+		'''Parameter:
+			difficulty		der Schwierigkeitsgrad
+			seed			(optional) Seed für den Zufallsgenerator. Mit demselben
+							Seed wird immer dasselbe Sudoku erzeugt, wiederholte
+							Anfragen werden aus einem Cache der letzten
+							GENERATED Sudokus beantwortet.
+			timeout			(optional) die maximale Zeit in Sekunden für das Erzeugen
+			cancel			(optional) ein threading.Event, das das Erzeugen abbricht
+			fallback		(optional) eine Funktion, die für einen Schwierigkeitsgrad
+							ein MySudoku oder None liefert, z.B. SudokuPool.take
+
+		Wird das Erzeugen abgebrochen oder dauert es länger als timeout, wird
+		stattdessen ein Sudoku von fallback, eine Variante eines zuletzt erzeugten
+		oder eines mitgelieferten Sudokus verwendet (siehe _replacement). Das
+		Sudoku hängt dann nicht vom seed ab und replaced ist True.
+
+		stats enthält die Zähler von Sudoku.create, bei einem ersetzten Sudoku die
+		des abgebrochenen Versuchs, und ist None wenn das Sudoku aus dem Cache kam.
+		Sie werden auch in generator_stats gezählt.'''
+		self.difficulty = difficulty
+		self.seed = seed
+		self.stats = None
+		self.replaced = False
+
+		cached = None
+		if seed is not None:
+			cached = MySudoku._generated.get((seed, difficulty, (3, 3)))
+		if cached is not None:
+			numbers, solution = cached
+		else:
+			deadline = None
+			if timeout is not None:
+				deadline = time.time() + timeout
+			try:
+				numbers, solution = self._create(difficulty, seed, deadline, cancel)
+			except Cancelled, e:
+				log.warning("Sudoku '%s' nicht erzeugt (%s), verwende Ersatz" % (difficulty, e))
+				self.seed = None
+				self.replaced = True
+				numbers, solution = self._replacement(difficulty, fallback)
+			generator_stats.record(difficulty, self.stats, self.replaced)
+
+		self.sudoku = [row[:] for row in numbers]
+		self.solution = [row[:] for row in solution]
+
+		self._calculate_hash()
+
+	def _create(self, difficulty, seed, deadline, cancel):
+		'''Erzeugt ein neues Sudoku.
+
+		Rückgabe:			ein Tupel (sudoku, lösung)
+
+		Exceptions:
+			Cancelled		wenn die deadline überschritten oder cancel gesetzt ist'''
+		sudoku = Sudoku(Board(3), difficulty, engine="bitmask")
+		try:
+			sudoku.create(seed=seed, deadline=deadline, cancel=cancel)
+		finally:
+			self.stats = sudoku.stats
+		numbers = sudoku.to_board().rows()
+		# lösung übernehmen, das erzeugte sudoku muss nicht noch einmal gelöst werden
+		solution = sudoku.solution().rows()
+		if seed is not None:
+			MySudoku._generated.put((seed, difficulty, (3, 3)), (numbers, solution))
+		recent = MySudoku._recent.setdefault(difficulty, [])
+		recent.append((numbers, solution))
+		del recent[:-RECENT]
+		return numbers, solution
+
+	def _replacement(self, difficulty, fallback):
+		'''Gibt ein Ersatz-Sudoku zurück, ohne ein neues zu erzeugen. Versucht
+		werden der Reihe nach fallback, eine Variante eines zuletzt erzeugten und
+		eine Variante eines mitgelieferten Sudokus.
+
+		Rückgabe:			ein Tupel (sudoku, lösung)
+
+		Exceptions:
+			SudokufillerException	wenn es kein Sudoku des Schwierigkeitsgrades gibt'''
+		if fallback is not None:
+			other = fallback(difficulty)
+			if other is not None:
+				return other.sudoku, other.solution
+
+		candidates = MySudoku._recent.get(difficulty)
+		if not candidates:
+			candidates = MySudoku._bundled_sudokus().get(difficulty)
+		if not candidates:
+			raise SudokufillerException(
+				"Kein Ersatz für ein Sudoku '%s' vorhanden" % difficulty)
+		numbers, solution = random.choice(candidates)
+		transform = random_transform((3, 3))
+		return transform.apply_numbers(numbers), transform.apply_numbers(solution)
+
+	@classmethod
+	def _bundled_sudokus(cls):
+		'''Gibt die mitgelieferten Sudokus nach Schwierigkeitsgrad zurück. Sie sind
+		schon bewertet und gelöst (siehe sudoku.puzzles.grade_puzzles) und werden
+		beim ersten Aufruf nur eingelesen, das dauert wenige Millisekunden.'''
+		if cls._bundled is None:
+			bundled = {}
+			for label, boards in load_graded().items():
+				bundled[label] = [(board.rows(), solution.rows())
+									for board, solution in boards]
+			cls._bundled = bundled
+		return cls._bundled
+
+	@classmethod
+	def from_numbers(cls, difficulty, sudoku, solution):
+		'''Erzeugt ein MySudoku aus einem bereits erzeugten Sudoku, z.B. aus einem Vorrat.
+
+		Parameter:
+			difficulty		der Schwierigkeitsgrad
+			sudoku			eine Liste mit 9 Listen mit je 9 Zahlen (0 für leere Felder)
+			solution		die Lösung im selben Format'''
+		self = cls.__new__(cls)
+		self.difficulty = difficulty
+		self.sudoku = sudoku
+		self.solution = solution
+		self.seed = None
+		self.stats = None
+		self.replaced = False
+		self._calculate_hash()
+		return self
+
+	def variant(self, seed=None):
+		'''Erzeugt ein anderes Sudoku mit derselben Schwierigkeit, indem die Zahlen
+		vertauscht und die Zeilen und Spalten symmetrisch umgestellt werden. Das
+		geht in Mikrosekunden, so reichen wenige erzeugte Sudokus für viele Pläne.
+
+		Parameter:
+			seed			(optional) Seed für den Zufallsgenerator
+
+		Rückgabe:			ein neues MySudoku-Objekt'''
+		transform = random_transform((3, 3), random.Random(seed))
+		return MySudoku.from_numbers(self.difficulty,
+									transform.apply_numbers(self.sudoku),
+									transform.apply_numbers(self.solution))
+
+	def _calculate_hash(self):
+		'''Berechnet den hash des Sudokus'''
+		self.hash = md5(''.join([str(num) for row in self.sudoku for num in row])).hexdigest()
+
+	def canonical_hash(self):
+		'''Gibt den md5-hash der kanonischen Form des Sudokus zurück. Alle Varianten
+		eines Sudokus (siehe variant) haben denselben hash. Die kanonische Form zu
+		berechnen dauert einige 10ms, deshalb wird sie erst beim ersten Aufruf
+		berechnet.'''
+		if getattr(self, '_canonical_hash', None) is None:
+			board = Board(3)
+			board.load_numbers([num for row in self.sudoku for num in row], board.cellsize)
+			self._canonical_hash = md5(canonical(board)).hexdigest()
+		return self._canonical_hash
+
+def _create_sudoku((difficulty, seed)):
+	'''Erzeugt ein Sudoku in einem Prozess des Pools. Geforkte Prozesse haben
+	denselben Zustand des Zufallsgenerators, deshalb bekommt jedes Sudoku einen
+	eigenen Seed.'''
+	return MySudoku(difficulty, seed)
+
+def generate_many(difficulties, workers=None):
+	'''Erzeugt Sudokus für die gegebenen Schwierigkeitsgrade parallel in mehreren
+	Prozessen (wegen des GIL bringen Threads hier nichts). Jedes Sudoku wird
+	zurückgegeben, sobald es fertig ist, also nicht unbedingt in der Reihenfolge
+	der Schwierigkeitsgrade (siehe MySudoku.difficulty).
+
+	Parameter:
+		difficulties	eine Liste mit Schwierigkeitsgraden
+		workers			(optional) die Anzahl der Prozesse (Standard: Anzahl der CPUs)
+
+	Rückgabe:			ein Generator mit MySudoku-Objekten'''
+	if workers is None:
+		workers = cpu_count()
+	workers = min(workers, len(difficulties))
+
+	if workers <= 1:
+		for difficulty in difficulties:
+			yield MySudoku(difficulty)
+		return
+
+	seeds = random.SystemRandom()
+	tasks = [(difficulty, seeds.getrandbits(64)) for difficulty in difficulties]
+	pool = Pool(workers)
+	try:
+		for s in pool.imap_unordered(_create_sudoku, tasks):
+			# die zähler der anderen prozesse sind dort geblieben
+			generator_stats.record(s.difficulty, s.stats, s.replaced)
+			yield s
+	finally:
+		pool.terminate()
+		pool.join()
 				
 
 def fill_sudoku_table(sudoku_table, numbers):
@@ -141,7 +520,7 @@ def fill_sudoku_table(sudoku_table, numbers):
 	rows = sudoku_table.getElementsByType(table.TableRow)
 	if len(rows) != 9:
 		raise SudokufillerException("Tabelle '%s' hat nicht 9 Zeilen" % 
-			self.table_name)
+			sudoku_table.getAttribute("name"))
 
 	row_idx = 0
 	for row in rows:
@@ -167,3 +546,84 @@ def fill_sudoku_table(sudoku_table, numbers):
 		
 			col_idx += 1
 		row_idx += 1
+
+# zuletzt verwendete bilder: schlüssel -> png, die übrigen liegen in cache_dir
+_images = _LRUCache(IMAGES)
+
+def sudoku_png(numbers, key, cache_dir=None):
+	'''Gibt ein Sudoku als PNG zurück. Die Bilder werden über den Schlüssel (z.B.
+	MySudoku.hash) zwischengespeichert, die letzten IMAGES im Speicher und, wenn
+	gegeben, alle als <key>.png in cache_dir. Dort kann sie auch die Webversion
+	des Plans verwenden.
+
+	Parameter:
+		numbers			eine Liste mit 9 Listen mit je 9 Zahlen (0 für leere Felder)
+		key				der Schlüssel des Bildes
+		cache_dir		(optional) das Verzeichnis für die Bilder
+
+	Rückgabe:			das PNG als String'''
+	data = _images.get(key)
+	if data is not None:
+		return data
+
+	filename = None
+	if cache_dir is not None:
+		filename = os.path.join(cache_dir, key + '.png')
+		if os.path.exists(filename):
+			f = open(filename, 'rb')
+			data = f.read()
+			f.close()
+			_images.put(key, data)
+			return data
+
+	# PIL wird nur für die bilder gebraucht
+	from sudoku.image import renderer
+	board = Board(3)
+	board.load_numbers([num for row in numbers for num in row], board.cellsize)
+	data = renderer().tostring(board, 'PNG')
+
+	if filename is not None:
+		if not os.path.isdir(cache_dir):
+			os.makedirs(cache_dir)
+		f = open(filename, 'wb')
+		f.write(data)
+		f.close()
+	_images.put(key, data)
+	return data
+
+def embed_sudoku_image(doc, sudoku_table, numbers, key, cache_dir=None, size=IMAGE_SIZE):
+	'''Ersetzt eine Tabelle in einem OpenDocument ODT Dokument durch ein Bild des
+	Sudokus. Statt 81 Zellen kommt nur ein Rahmen mit dem Bild in das Dokument.
+	Das Bild wird je Schlüssel nur einmal gerendert (siehe sudoku_png) und als
+	Pictures/<key>.png im Dokument gespeichert.
+
+	Parameter:
+		doc				das ODT Dokument
+		sudoku_table	die Tabelle die ersetzt werden soll
+		numbers			eine Liste mit 9 Listen mit je 9 Zahlen (0 für leere Felder)
+		key				der Schlüssel des Bildes (z.B. MySudoku.hash)
+		cache_dir		(optional) das Verzeichnis für die Bilder
+		size			(optional) Breite und Höhe des Bildes im Dokument'''
+	data = sudoku_png(numbers, key, cache_dir)
+	# fester name statt addPictureFromString, so ist jedes bild nur einmal im dokument
+	href = doc.addPicture('Pictures/%s.png' % key, 'image/png', data)
+
+	frame = draw.Frame(name=sudoku_table.getAttribute("name"), width=size,
+						height=size, anchortype="as-char")
+	frame.addElement(draw.Image(href=href, type="simple", show="embed",
+								actuate="onLoad"))
+	paragraph = text.P()
+	paragraph.addElement(frame)
+
+	parent = sudoku_table.parentNode
+	parent.insertBefore(paragraph, sudoku_table)
+	parent.removeChild(sudoku_table)
+
+def sudoku_key(table_name):
+	'''Gibt den Schlüssel zurück, über den eine "Sudoku*" Tabelle und die
+	zugehörige "Solution*" Tabelle verbunden sind (z.B. "_1" für "Sudoku_1" und
+	"Solution_1"). Für andere Tabellen wird None zurückgegeben.'''
+	for prefix in (SUDOKU_PREFIX, SOLUTION_PREFIX):
+		if table_name.startswith(prefix):
+			return table_name[len(prefix):]
+	return None
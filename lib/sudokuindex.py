@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Martin Thurau <martin.thurau@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import mmap
+import os
+import struct
+from tempfile import mkstemp
+
+import logging
+log = logging.getLogger('mensaplan.index')
+
+# kopf der datei: kennung, version, anzahl der sudokus, anzahl der plätze
+MAGIC = 'SDKI'
+VERSION = 1
+HEADER = struct.Struct('<4sBxxxQQ')
+# ein platz enthält die ersten 8 byte des kanonischen hashs, 0 ist ein freier platz
+SLOT = struct.Struct('<Q')
+
+# anzahl der plätze einer neuen datei
+CAPACITY = 1024
+# maximaler anteil belegter plätze, darüber wird die tabelle verdoppelt
+MAX_LOAD = 0.7
+
+def index_key(sudoku):
+	'''Gibt den Schlüssel eines Sudokus im Index zurück, alle Varianten eines
+	Sudokus haben denselben Schlüssel.
+
+	Parameter:
+		sudoku			ein MySudoku-Objekt
+
+	Rückgabe:			eine Zahl zwischen 1 und 2**64 - 1'''
+	return int(sudoku.canonical_hash()[:16], 16) or 1
+
+def _create(filename, capacity):
+	'''Legt eine leere Index-Datei mit capacity Plätzen an'''
+	f = open(filename, 'wb')
+	try:
+		f.write(HEADER.pack(MAGIC, VERSION, 0, capacity))
+		# die plätze sind nullen, truncate legt sie ohne schreiben an
+		f.truncate(HEADER.size + capacity * SLOT.size)
+	finally:
+		f.close()
+
+class PublishedIndex(object):
+	'''Index aller bereits veröffentlichten Sudokus.
+
+	Gespeichert wird nur der Schlüssel der kanonischen Form (siehe index_key),
+	also 8 Byte je Sudoku, in einer Hashtabelle mit offener Adressierung direkt
+	in der Datei. Die Datei wird per mmap gelesen und geschrieben, ein Test oder
+	Eintrag liest also nur wenige Plätze und nicht den ganzen Index. Ist die
+	Tabelle zu voll, wird sie in eine neue Datei doppelter Größe umkopiert, die
+	dann per os.rename die alte ersetzt.
+
+	Der Index darf nur von einem Prozess zur Zeit geschrieben werden.'''
+
+	def __init__(self, filename):
+		'''Parameter:
+			filename		die Index-Datei, wird ggf. angelegt
+
+		Exceptions:
+			ValueError		wenn die Datei kein Index ist'''
+		self.filename = filename
+		if not os.path.exists(filename):
+			_create(filename, CAPACITY)
+		self._open()
+
+	def _open(self):
+		'''Öffnet die Index-Datei und liest den Kopf'''
+		f = open(self.filename, 'r+b')
+		try:
+			header = f.read(HEADER.size)
+			if len(header) != HEADER.size:
+				raise ValueError("'%s' ist kein Sudoku-Index" % self.filename)
+			magic, version, self._count, self._capacity = HEADER.unpack(header)
+			if magic != MAGIC or version != VERSION:
+				raise ValueError("'%s' ist kein Sudoku-Index" % self.filename)
+			self._map = mmap.mmap(f.fileno(), 0)
+		finally:
+			f.close()
+
+	def __len__(self):
+		return self._count
+
+	def _slot(self, key):
+		'''Gibt die Position des Platzes für key zurück: der Platz mit key oder der
+		erste freie Platz'''
+		capacity = self._capacity
+		slot = key % capacity
+		while True:
+			offset = HEADER.size + slot * SLOT.size
+			found = SLOT.unpack_from(self._map, offset)[0]
+			if found == key or not found:
+				return offset
+			slot = (slot + 1) % capacity
+
+	def __contains__(self, sudoku):
+		'''Gibt zurück, ob das Sudoku oder eine Variante davon im Index ist.
+
+		Parameter:
+			sudoku			ein MySudoku-Objekt'''
+		return self.contains_key(index_key(sudoku))
+
+	def contains_key(self, key):
+		'''Gibt zurück, ob der Schlüssel im Index ist (siehe index_key)'''
+		return SLOT.unpack_from(self._map, self._slot(key))[0] == key
+
+	def add(self, sudoku):
+		'''Nimmt ein Sudoku in den Index auf.
+
+		Parameter:
+			sudoku			ein MySudoku-Objekt
+
+		Rückgabe:			False wenn das Sudoku schon im Index war'''
+		return self.add_key(index_key(sudoku))
+
+	def add_key(self, key):
+		'''Nimmt einen Schlüssel in den Index auf (siehe index_key).
+
+		Rückgabe:			False wenn der Schlüssel schon im Index war'''
+		if self.contains_key(key):
+			return False
+		if self._count + 1 > self._capacity * MAX_LOAD:
+			self._grow()
+		SLOT.pack_into(self._map, self._slot(key), key)
+		self._count += 1
+		HEADER.pack_into(self._map, 0, MAGIC, VERSION, self._count, self._capacity)
+		return True
+
+	def keys(self):
+		'''Gibt einen Generator mit allen Schlüsseln des Index zurück'''
+		for slot in xrange(self._capacity):
+			key = SLOT.unpack_from(self._map, HEADER.size + slot * SLOT.size)[0]
+			if key:
+				yield key
+
+	def _grow(self):
+		'''Kopiert den Index in eine Tabelle mit doppelt so vielen Plätzen'''
+		capacity = self._capacity * 2
+		log.debug("Vergrößere Index '%s' auf %d Plätze" % (self.filename, capacity))
+		fd, tmpname = mkstemp(dir=os.path.dirname(os.path.abspath(self.filename)),
+							suffix='.tmp')
+		os.close(fd)
+		try:
+			_create(tmpname, capacity)
+			bigger = PublishedIndex(tmpname)
+			for key in self.keys():
+				bigger.add_key(key)
+			bigger.close()
+			self.close()
+			os.rename(tmpname, self.filename)
+		except:
+			if os.path.exists(tmpname):
+				os.remove(tmpname)
+			raise
+		self._open()
+
+	def flush(self):
+		'''Schreibt alle Änderungen in die Datei'''
+		self._map.flush()
+
+	def close(self):
+		'''Schreibt alle Änderungen und schließt den Index'''
+		self._map.flush()
+		self._map.close()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# Copyright (c) 2010 Martin Thurau <martin.thurau@gmail.com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import errno
+import os
+import sys
+import threading
+from collections import deque
+from tempfile import mkstemp
+
+from sudokufiller import MySudoku
+
+import logging
+log = logging.getLogger('mensaplan.pool')
+
+# standardwerte für den füllstand eines schwierigkeitsgrades
+LOW_WATER = 10
+HIGH_WATER = 40
+
+# endungen der dateien im vorrat
+SUFFIX = '.sudoku'
+CLAIMED = '.claimed'
+
+# zum lesen der verzeichnisse, in den tests ersetzbar
+_listdir = os.listdir
+
+def _running(pid):
+	'''Gibt zurück, ob ein Prozess mit der pid läuft'''
+	if pid == os.getpid():
+		return True
+	if sys.platform == 'win32':
+		# os.kill beendet unter windows den prozess
+		import ctypes
+		SYNCHRONIZE = 0x100000
+		handle = ctypes.windll.kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+		if not handle:
+			return False
+		ctypes.windll.kernel32.CloseHandle(handle)
+		return True
+	try:
+		os.kill(pid, 0)
+	except OSError, e:
+		# EPERM: der prozess läuft, gehört aber einem anderen benutzer
+		return e.errno == errno.EPERM
+	return True
+
+def _encode(numbers):
+	'''Wandelt eine Liste mit 9 Listen mit je 9 Zahlen in eine Zeile um'''
+	return ''.join([str(num) for row in numbers for num in row])
+
+def _decode(line):
+	'''Wandelt eine Zeile mit 81 Ziffern in eine Liste mit 9 Listen um'''
+	line = line.strip()
+	if len(line) != 81 or not line.isdigit():
+		raise ValueError("Ungültige Zeile im Sudoku-Vorrat: '%s'" % line)
+	return [[int(c) for c in line[j:j + 9]] for j in xrange(0, 81, 9)]
+
+class SudokuPool(object):
+	'''Ein Vorrat an vorab erzeugten Sudokus auf der Festplatte.
+
+	Für jeden Schwierigkeitsgrad gibt es ein Verzeichnis, jedes Sudoku liegt als
+	eigene Datei (Name ist der hash des Sudokus) darin. Die erste Zeile einer
+	Datei ist das Sudoku, die zweite die Lösung. Dateien werden unter einem
+	temporären Namen geschrieben und erst dann umbenannt, ein Sudoku wird beim
+	Entnehmen zuerst umbenannt. Da os.rename atomar ist, wird kein Sudoku doppelt
+	ausgegeben, auch nicht an mehrere Prozesse.
+
+	Die Dateinamen jedes Schwierigkeitsgrades werden in einer Warteschlange im
+	Speicher gehalten, die add ergänzt. Das Verzeichnis wird nur gelesen, wenn
+	die Warteschlange leer ist, z.B. für Sudokus die ein anderer Prozess abgelegt
+	hat. Dabei werden auch Sudokus zurückgelegt, die ein abgestürzter Prozess
+	umbenannt aber nicht mehr gelöscht hat.'''
+
+	def __init__(self, directory, low_water=LOW_WATER, high_water=HIGH_WATER):
+		'''Parameter:
+			directory		das Verzeichnis des Vorrats, wird ggf. angelegt
+			low_water		(optional) unter dieser Anzahl wird ein
+							Schwierigkeitsgrad nachgefüllt
+			high_water		(optional) bis zu dieser Anzahl wird nachgefüllt'''
+		self.directory = directory
+		self.low_water = low_water
+		self.high_water = max(low_water, high_water)
+		self._refill_thread = None
+		# schwierigkeitsgrad -> zähler für health
+		self._counters = {}
+		# schwierigkeitsgrad -> warteschlange der dateinamen (siehe take)
+		self._queues = {}
+		self._lock = threading.Lock()
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+
+	def _bucket(self, difficulty):
+		'''Gibt das Verzeichnis eines Schwierigkeitsgrades zurück und legt es ggf. an'''
+		bucket = os.path.join(self.directory, difficulty)
+		if not os.path.isdir(bucket):
+			try:
+				os.makedirs(bucket)
+			except OSError:
+				# von einem anderen prozess angelegt
+				if not os.path.isdir(bucket):
+					raise
+		return bucket
+
+	def _entries(self, difficulty):
+		'''Gibt die Dateinamen der verfügbaren Sudokus eines Schwierigkeitsgrades zurück'''
+		return [name for name in _listdir(self._bucket(difficulty))
+					if name.endswith(SUFFIX)]
+
+	def _scan(self, difficulty):
+		'''Liest das Verzeichnis eines Schwierigkeitsgrades wie _entries und legt
+		dabei die von abgestürzten Prozessen entnommenen Sudokus zurück'''
+		bucket = self._bucket(difficulty)
+		names = []
+		for name in _listdir(bucket):
+			if name.endswith(CLAIMED):
+				name = self._restore(bucket, name)
+			if name is not None and name.endswith(SUFFIX):
+				names.append(name)
+		return names
+
+	def _restore(self, bucket, claimed):
+		'''Benennt ein entnommenes Sudoku (<hash>.sudoku.<pid>.claimed) wieder um,
+		wenn der Prozess der es entnommen hat nicht mehr läuft.
+
+		Rückgabe:			der Dateiname des Sudokus oder None'''
+		try:
+			name, pid = claimed[:-len(CLAIMED)].rsplit('.', 1)
+			pid = int(pid)
+		except ValueError:
+			return None
+		if _running(pid):
+			return None
+		try:
+			os.rename(os.path.join(bucket, claimed), os.path.join(bucket, name))
+		except OSError:
+			# schon von einem anderen prozess zurückgelegt
+			return None
+		log.info("Sudoku '%s' von Prozess %d zurückgelegt" % (name, pid))
+		return name
+
+	def difficulties(self):
+		'''Gibt die Schwierigkeitsgrade zurück für die es ein Verzeichnis gibt'''
+		return sorted([name for name in _listdir(self.directory)
+						if os.path.isdir(os.path.join(self.directory, name))])
+
+	def count(self, difficulty):
+		'''Gibt die Anzahl der verfügbaren Sudokus eines Schwierigkeitsgrades zurück'''
+		return len(self._entries(difficulty))
+
+	def add(self, sudoku):
+		'''Legt ein Sudoku in den Vorrat.
+
+		Parameter:
+			sudoku			ein MySudoku-Objekt'''
+		bucket = self._bucket(sudoku.difficulty)
+		fd, tmpname = mkstemp(dir=bucket, suffix='.tmp')
+		try:
+			f = os.fdopen(fd, 'w')
+			f.write(_encode(sudoku.sudoku) + '\n')
+			f.write(_encode(sudoku.solution) + '\n')
+			f.close()
+			os.rename(tmpname, os.path.join(bucket, sudoku.hash + SUFFIX))
+		except:
+			os.remove(tmpname)
+			raise
+		self._lock.acquire()
+		try:
+			self._queues.setdefault(sudoku.difficulty, deque()).append(sudoku.hash + SUFFIX)
+		finally:
+			self._lock.release()
+
+	def _next(self, difficulty, rescan):
+		'''Gibt den nächsten Dateinamen aus der Warteschlange eines
+		Schwierigkeitsgrades zurück.
+
+		Parameter:
+			difficulty		der Schwierigkeitsgrad
+			rescan			ob das Verzeichnis gelesen wird, wenn die
+							Warteschlange leer ist
+
+		Rückgabe:			ein Tupel aus dem Dateinamen (None wenn es keinen
+							gibt) und ob das Verzeichnis gelesen wurde'''
+		self._lock.acquire()
+		try:
+			queue = self._queues.setdefault(difficulty, deque())
+			scanned = False
+			if not queue and rescan:
+				queue.extend(self._scan(difficulty))
+				scanned = True
+			if queue:
+				return queue.popleft(), scanned
+			return None, scanned
+		finally:
+			self._lock.release()
+
+	def take(self, difficulty):
+		'''Entnimmt ein Sudoku aus dem Vorrat.
+
+		Parameter:
+			difficulty		der Schwierigkeitsgrad
+
+		Rückgabe:			ein MySudoku-Objekt oder None wenn der Vorrat leer ist'''
+		bucket = self._bucket(difficulty)
+		# das verzeichnis höchstens einmal lesen, falls alle namen veraltet sind
+		rescan = True
+		while True:
+			name, scanned = self._next(difficulty, rescan)
+			if name is None:
+				return None
+			if scanned:
+				rescan = False
+			path = os.path.join(bucket, name)
+			claimed = '%s.%d%s' % (path, os.getpid(), CLAIMED)
+			try:
+				os.rename(path, claimed)
+			except OSError:
+				# schon von einem anderen prozess entnommen
+				continue
+			try:
+				f = open(claimed)
+				lines = f.readlines()
+				f.close()
+				self._count(difficulty, 'taken')
+				return MySudoku.from_numbers(difficulty,
+											_decode(lines[0]), _decode(lines[1]))
+			except (IOError, IndexError, ValueError), e:
+				log.warning("Ungültiges Sudoku '%s' im Vorrat: %s" % (path, e))
+			finally:
+				os.remove(claimed)
+
+	def checkout(self, difficulty, timeout=None):
+		'''Entnimmt ein Sudoku aus dem Vorrat. Ist der Vorrat leer, wird ein neues
+		Sudoku erzeugt.
+
+		Parameter:
+			difficulty		der Schwierigkeitsgrad
+			timeout			(optional) die maximale Zeit in Sekunden für das
+							Erzeugen (siehe MySudoku)
+
+		Rückgabe:			ein MySudoku-Objekt'''
+		sudoku = self.take(difficulty)
+		if sudoku is None:
+			self._count(difficulty, 'misses')
+			log.info("Vorrat für '%s' ist leer, erzeuge neues Sudoku" % difficulty)
+			sudoku = MySudoku(difficulty, timeout=timeout)
+		return sudoku
+
+	def refill(self, difficulties=None):
+		'''Füllt alle Schwierigkeitsgrade die unter low_water liegen bis high_water auf.
+
+		Parameter:
+			difficulties	(optional) die Schwierigkeitsgrade
+							(Standard: alle vorhandenen)
+
+		Rückgabe:			die Anzahl der erzeugten Sudokus'''
+		if difficulties is None:
+			difficulties = self.difficulties()
+		created = 0
+		for difficulty in set(difficulties):
+			available = self.count(difficulty)
+			if available >= self.low_water:
+				continue
+			log.debug("Fülle Vorrat für '%s' auf (%d vorhanden)" % (difficulty, available))
+			for i in xrange(self.high_water - available):
+				self.add(MySudoku(difficulty))
+				created += 1
+				self._count(difficulty, 'refilled')
+		return created
+
+	def _count(self, difficulty, name):
+		'''Erhöht einen Zähler eines Schwierigkeitsgrades (siehe health)'''
+		self._lock.acquire()
+		try:
+			if difficulty not in self._counters:
+				self._counters[difficulty] = {'taken': 0, 'misses': 0, 'refilled': 0}
+			self._counters[difficulty][name] += 1
+		finally:
+			self._lock.release()
+
+	def health(self):
+		'''Gibt den Zustand des Vorrats zurück, z.B. für GeneratorStats.dump.
+
+		Rückgabe:			ein dict mit "low_water", "high_water" und unter
+							"difficulties" je Schwierigkeitsgrad "available" (Sudokus
+							im Vorrat), "taken" (entnommen), "misses" (Vorrat war
+							leer, neu erzeugt) und "refilled" (nachgefüllt), die
+							Zähler seit dem Anlegen des Objekts'''
+		self._lock.acquire()
+		try:
+			counters = dict([(difficulty, dict(c)) for difficulty, c in self._counters.items()])
+		finally:
+			self._lock.release()
+		difficulties = {}
+		for difficulty in set(self.difficulties()) | set(counters):
+			health = counters.get(difficulty, {'taken': 0, 'misses': 0, 'refilled': 0})
+			health['available'] = self.count(difficulty)
+			difficulties[difficulty] = health
+		return {'low_water': self.low_water,
+				'high_water': self.high_water,
+				'difficulties': difficulties}
+
+	def start_refill(self, difficulties=None):
+		'''Startet refill in einem Hintergrund-Thread, wenn nicht schon einer läuft.
+
+		Parameter:
+			difficulties	(optional) die Schwierigkeitsgrade
+
+		Rückgabe:			der Thread'''
+		if self._refill_thread is None or not self._refill_thread.isAlive():
+			self._refill_thread = threading.Thread(target=self.refill,
+												args=(difficulties,),
+												name='SudokuPoolRefill')
+			self._refill_thread.setDaemon(True)
+			self._refill_thread.start()
+		return self._refill_thread
+
+if __name__ == "__main__":
+	# nachfüllen per cronjob: sudokupool.py VERZEICHNIS [SCHWIERIGKEITSGRAD ...]
+	from sudokufiller import DIFFICULTY
+	logging.basicConfig(level=logging.INFO)
+	if len(sys.argv) < 2:
+		print "Aufruf: %s VERZEICHNIS [SCHWIERIGKEITSGRAD ...]" % sys.argv[0]
+		sys.exit(1)
+	pool = SudokuPool(sys.argv[1])
+	created = pool.refill(sys.argv[2:] or DIFFICULTY)
+	log.info("%d Sudokus erzeugt" % created)
@@ -39,7 +39,10 @@ if __file__:
 from odf.opendocument import load
 from odf import table
 from planparser import MensaplanParser, fill_meal_table
-from sudokufiller import MySudoku, fill_sudoku_table
+from sudokufiller import MySudoku, fill_sudoku_table, embed_sudoku_image, sudoku_key, \
+	generator_stats, SOLUTION_PREFIX, SOLUTION_SUFFIX, DIFFICULTY
+from sudokupool import SudokuPool
+from sudokuindex import PublishedIndex
 import locale
 
 try:
@@ -52,6 +55,10 @@ except:
 URI = '''http://www.uni-kiel.de/stwsh/seiten_essen/plan_mensa_luebeck.html'''
 # Vorlage für den Mensaplan
 TEMPLATE = join(appDir, 'mensaplan.odt')
+# maximale zeit in sekunden für ein neues sudoku, danach wird ein ersatz verwendet
+TIMEOUT = 5.0
+# so oft wird ein neues sudoku versucht, wenn es schon gedruckt wurde
+MAX_TRIES = 10
 
 
 class Main(Frame):
@@ -61,6 +68,19 @@ class Main(Frame):
 		parser = OptionParser()
 		parser.add_option('-d', '--debug', action='store_true', dest='debug')
 		parser.add_option('-f', '--from-file', action='store', dest='file')
+		parser.add_option('-p', '--pool', action='store', dest='pool',
+							help='Verzeichnis mit vorab erzeugten Sudokus')
+		parser.add_option('-t', '--timeout', action='store', dest='timeout',
+							type='float', default=TIMEOUT,
+							help='maximale Zeit in Sekunden für ein neues Sudoku')
+		parser.add_option('-i', '--index', action='store', dest='index',
+							help='Index der bereits gedruckten Sudokus')
+		parser.add_option('-b', '--images', action='store_true', dest='images',
+							help='Sudokus als Bilder statt in Tabellen einfügen')
+		parser.add_option('-c', '--image-cache', action='store', dest='image_cache',
+							help='Verzeichnis für die Bilder der Sudokus')
+		parser.add_option('-s', '--stats', action='store', dest='stats',
+							help='Datei für die Zähler der Sudoku-Erzeugung (JSON)')
 		
 		self.options, self.args = parser.parse_args()
 
@@ -68,6 +88,15 @@ class Main(Frame):
 			logging.basicConfig(level=logging.DEBUG)
 			logging.info("Loglevel auf DEBUG gesetzt")
 
+		self.pool = None
+		if self.options.pool:
+			self.pool = SudokuPool(self.options.pool)
+			self.pool.start_refill(DIFFICULTY)
+
+		self.index = None
+		if self.options.index:
+			self.index = PublishedIndex(self.options.index)
+
 		# tk initialisieren
 		Frame.__init__(self, master)   
 		self.grid()                    
@@ -83,6 +112,29 @@ class Main(Frame):
 		self.textField.insert(END, message + "\n")
 		self.update_idletasks()
 	
+	def new_sudoku(self, difficulty):
+		'''Gibt ein Sudoku aus dem Vorrat oder ein neu erzeugtes zurück, das noch
+		nicht gedruckt wurde (siehe PublishedIndex). Nach MAX_TRIES Versuchen wird
+		das letzte Sudoku trotzdem verwendet.'''
+		for i in xrange(MAX_TRIES):
+			if self.pool:
+				s = self.pool.checkout(difficulty, self.options.timeout)
+			else:
+				s = MySudoku(difficulty, timeout=self.options.timeout)
+			if self.index is None or s not in self.index:
+				break
+			logging.info("Sudoku %s wurde schon gedruckt" % s.hash)
+		return s
+
+	def publish(self, sudokus):
+		'''Nimmt gedruckte Sudokus in den Index auf, damit sie nicht noch einmal
+		verwendet werden. Ein leerer Index hat die Länge 0, deshalb der Vergleich
+		mit None.'''
+		if self.index is not None:
+			for s in sudokus:
+				self.index.add(s)
+			self.index.flush()
+
 	def save_odt(self):
 		'''Signalhandler für den "Starten" Knopf. Fragt nach dem Speicherort und startet
 		anschließend den Workerthread'''
@@ -123,7 +175,9 @@ class Main(Frame):
 		odt_doc = load(TEMPLATE)
 
 		# schwierigkeitsgrade der sudokus (in umgekehrter reihenfolge
-		difficulty = ["normal", "easy", "normal", "easy"]
+		difficulty = list(DIFFICULTY)
+		# "Sudoku_1" und "Solution_1" bekommen dasselbe sudoku
+		sudokus = {}
 
 		for t in odt_doc.getElementsByType(table.Table):
 			table_name = t.getAttribute("name")
@@ -131,12 +185,36 @@ class Main(Frame):
 				fill_meal_table(t, days)	
 				self.msg("Schreibe Mensaplan in Tabelle 'Mensaplan'")
 			
-			if table_name.startswith("Sudoku"):
-				s = MySudoku(difficulty.pop())
-				fill_sudoku_table(t, s.sudoku)
-				self.msg("Schreibe Sudoku in Tabelle '%s'" % table_name)
+			key = sudoku_key(table_name)
+			if key is not None:
+				if key not in sudokus:
+					sudokus[key] = self.new_sudoku(difficulty.pop())
+				s = sudokus[key]
+				if table_name.startswith(SOLUTION_PREFIX):
+					if self.options.images:
+						embed_sudoku_image(odt_doc, t, s.solution, s.hash + SOLUTION_SUFFIX,
+											self.options.image_cache)
+					else:
+						fill_sudoku_table(t, s.solution)
+					self.msg("Schreibe Lösung in Tabelle '%s'" % table_name)
+				else:
+					if self.options.images:
+						embed_sudoku_image(odt_doc, t, s.sudoku, s.hash,
+											self.options.image_cache)
+					else:
+						fill_sudoku_table(t, s.sudoku)
+					self.msg("Schreibe Sudoku in Tabelle '%s'" % table_name)
 		
 		odt_doc.save(str(self.filename))
+		self.publish(sudokus.values())
+		if self.pool:
+			# entnommene sudokus im hintergrund ersetzen
+			self.pool.start_refill(DIFFICULTY)
+		if self.options.stats:
+			if self.pool:
+				generator_stats.dump(self.options.stats, pool=self.pool.health())
+			else:
+				generator_stats.dump(self.options.stats)
 		self.msg("Fertig! Datei in '%s' gespeichert" % self.filename)
 		self.saveButton.configure(state = NORMAL)
 		self.msg("Starte OpenOffice")
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+appDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(appDir, 'lib'))
+
+from batch import create_batch
+from sudokufiller import SudokufillerException
+
+TEMPLATE = os.path.join(appDir, 'mensaplan.odt')
+
+class CreateBatchTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_too_few_difficulties(self):
+		# die vorlage hat 4 sudokus, es gibt aber nur 2 schwierigkeitsgrade
+		filename = os.path.join(self.directory, 'plan.odt')
+		self.assertRaises(SudokufillerException, create_batch, TEMPLATE, [],
+							[filename], difficulty=['easy', 'normal'], workers=1)
+		self.assertFalse(os.path.exists(filename))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+from sudoku.sudoku import difficulty
+from sudoku.puzzles import load_puzzles
+
+class DifficultyTest(unittest.TestCase):
+
+	def test_default_engine(self):
+		# ohne engine bleiben die bewertungen der "list" engine
+		for board in load_puzzles('hard'):
+			self.assertEqual(difficulty(board), difficulty(board, 'list'))
+
+	def test_grader(self):
+		# der grader bewertet wie die "bitmask" engine
+		for name in ('easy', 'hard', 'minimum'):
+			for board in load_puzzles(name):
+				self.assertEqual(difficulty(board, 'grader'), difficulty(board, 'bitmask'))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+from sudoku.puzzles import load_puzzles
+
+try:
+	import PIL.Image
+	import PIL.ImageChops
+	from sudoku import image
+	HAVE_PIL = True
+except ImportError:
+	HAVE_PIL = False
+
+class ImageTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_image_api(self):
+		if not HAVE_PIL:
+			return
+		board = load_puzzles('easy')[0]
+		filename = os.path.join(self.directory, 'sudoku.png')
+		im = image.Image(board, filename)
+		# die attribute und methoden von früher gibt es noch
+		self.assertEqual(im.boardsize, 9)
+		self.assertEqual(im.format, 'png')
+		self.assertTrue(im.in_greyscale('white'))
+		for name in ('numbers', 'cellsize', 'square_width', 'square_height', 'im', 'draw',
+					'create', 'draw_board', 'draw_numbers', 'save'):
+			self.assertTrue(hasattr(im, name), name)
+		# schritt für schritt gezeichnet wie vom Renderer
+		saved = PIL.Image.open(filename)
+		rendered = image.renderer().render(board)
+		self.assertEqual(PIL.ImageChops.difference(saved.convert('L'),
+						rendered.convert('L')).getbbox(), None)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+appDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(appDir, 'lib'))
+
+from odf.opendocument import load
+from odf import meta
+
+TEMPLATE = os.path.join(appDir, 'mensaplan.odt')
+
+def _root(node):
+	while node.parentNode is not None:
+		node = node.parentNode
+	return node
+
+class CloneTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def _check_independent(self, doc, clone):
+		for attr in ('meta', 'settings', 'styles', 'automaticstyles', 'body', 'text'):
+			node = getattr(clone, attr)
+			self.assertFalse(node is getattr(doc, attr), attr)
+			self.assertFalse(_root(node) is _root(getattr(doc, attr)), attr)
+			self.assertTrue(node.ownerDocument is clone, attr)
+		self.assertFalse(clone._styles_dict is doc._styles_dict)
+		for name, style in clone._styles_dict.items():
+			self.assertTrue(style.ownerDocument is clone, name)
+
+	def test_clone(self):
+		doc = load(TEMPLATE)
+		self._check_independent(doc, doc.clone())
+
+	def test_clone_after_save(self):
+		# save() hängt meta und settings aus topnode aus
+		doc = load(TEMPLATE)
+		doc.save(os.path.join(self.directory, 'doc.odt'))
+		clone = doc.clone()
+		self._check_independent(doc, clone)
+
+		count = len(doc.meta.childNodes)
+		clone.meta.addElement(meta.Keyword(text=u'Kopie'))
+		self.assertEqual(len(doc.meta.childNodes), count)
+		clone.save(os.path.join(self.directory, 'clone.odt'))
+		self.assertEqual(len(load(os.path.join(self.directory, 'clone.odt')).meta.childNodes),
+						count + 1)
+
+if __name__ == '__main__':
+	unittest.main()
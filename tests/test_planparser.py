@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+from odf import table
+from planparser import fill_meal_table, MealfillerException
+
+class FillMealTableTest(unittest.TestCase):
+
+	def _table(self):
+		'''Eine Tabelle nur mit der Überschrift'''
+		t = table.Table(name='Mensaplan')
+		t.addElement(table.TableRow())
+		return t
+
+	def test_header_only_without_days(self):
+		# ohne tage wird keine zeile gebraucht, die tabelle bleibt wie sie ist
+		t = self._table()
+		fill_meal_table(t, [])
+		self.assertEqual(len(t.getElementsByType(table.TableRow)), 1)
+
+	def test_header_only_with_days(self):
+		# für tage müssten zeilen angelegt werden, es gibt aber keine vorlage
+		self.assertRaises(MealfillerException, fill_meal_table, self._table(), [None])
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+from sudoku.puzzles import load_graded, grade_puzzles
+
+class GradedPuzzlesTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def _rows(self, graded):
+		return dict([(label, [(b.rows(), s.rows()) for b, s in boards])
+					for label, boards in graded.items()])
+
+	def test_bundled_up_to_date(self):
+		# die mitgelieferten dateien entsprechen einer neuen bewertung
+		grade_puzzles(self.directory)
+		self.assertEqual(self._rows(load_graded()), self._rows(load_graded(self.directory)))
+
+	def test_solutions(self):
+		for label, boards in load_graded().items():
+			for board, solution in boards:
+				for a, b in zip(board.rows(), solution.rows()):
+					for x, y in zip(a, b):
+						self.assertTrue(x == 0 or x == y)
+				for row in solution.rows():
+					self.assertEqual(sorted(row), range(1, 10))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+appDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(appDir, 'lib'))
+
+from odf.opendocument import load
+from odf import table, draw
+import sudokufiller
+from sudokufiller import MySudoku, GeneratorStats, embed_sudoku_image, sudoku_key, \
+	sudoku_png, _LRUCache
+
+try:
+	import PIL.Image
+	HAVE_PIL = True
+except ImportError:
+	HAVE_PIL = False
+
+TEMPLATE = os.path.join(appDir, 'mensaplan.odt')
+
+class EmbedSudokuImageTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	@unittest.skipUnless(HAVE_PIL, "PIL ist nicht installiert")
+	def test_embed_in_template(self):
+		doc = load(TEMPLATE)
+		cache = os.path.join(self.directory, 'bilder')
+		names = []
+		for t in list(doc.getElementsByType(table.Table)):
+			name = t.getAttribute('name')
+			if sudoku_key(name) is None:
+				continue
+			s = MySudoku('easy', seed=len(names))
+			embed_sudoku_image(doc, t, s.sudoku, s.hash, cache)
+			names.append((name, s.hash))
+		self.assertEqual(len(names), 4)
+
+		filename = os.path.join(self.directory, 'plan.odt')
+		doc.save(filename)
+
+		doc = load(filename)
+		tables = [t.getAttribute('name') for t in doc.getElementsByType(table.Table)]
+		frames = [f.getAttribute('name') for f in doc.getElementsByType(draw.Frame)]
+		for name, key in names:
+			self.assertFalse(name in tables)
+			self.assertTrue(name in frames)
+			picture = 'Pictures/%s.png' % key
+			self.assertTrue(picture in doc.Pictures)
+			self.assertTrue(doc.Pictures[picture][1].startswith('\x89PNG'))
+			self.assertTrue(os.path.exists(os.path.join(cache, key + '.png')))
+		# die tabelle mit dem mensaplan bleibt
+		self.assertTrue('Mensaplan' in tables)
+
+	@unittest.skipUnless(HAVE_PIL, "PIL ist nicht installiert")
+	def test_png_cache_bounded(self):
+		images = sudokufiller._images
+		images.clear()
+		cache = os.path.join(self.directory, 'bilder')
+		s = MySudoku('easy', seed=1)
+		data = sudoku_png(s.sudoku, s.hash, cache)
+		for n in xrange(images.size + 3):
+			sudoku_png(s.sudoku, 'key%d' % n)
+		self.assertEqual(len(images), images.size)
+		# verdrängte bilder kommen aus cache_dir
+		self.assertEqual(images.get(s.hash), None)
+		self.assertEqual(sudoku_png(s.sudoku, s.hash, cache), data)
+
+class LRUCacheTest(unittest.TestCase):
+
+	def test_evicts_least_recently_used(self):
+		cache = _LRUCache(2)
+		cache.put('a', 1)
+		cache.put('b', 2)
+		self.assertEqual(cache.get('a'), 1)
+		# 'b' wurde am längsten nicht verwendet
+		cache.put('c', 3)
+		self.assertEqual(len(cache), 2)
+		self.assertEqual(cache.get('b'), None)
+		self.assertEqual(cache.get('a'), 1)
+		self.assertEqual(cache.get('c'), 3)
+
+	def test_seeded_sudokus_bounded(self):
+		cache = MySudoku._generated
+		cache.clear()
+		for seed in xrange(cache.size + 3):
+			MySudoku('easy', seed=seed)
+		self.assertEqual(len(cache), cache.size)
+		# dasselbe sudoku auch nach dem verdrängen
+		self.assertEqual(MySudoku('easy', seed=0).hash, MySudoku('easy', seed=0).hash)
+
+class GeneratorStatsTest(unittest.TestCase):
+
+	def _stats(self, seconds):
+		stats = dict([(name, 0) for name in GeneratorStats.COUNTERS])
+		stats['seconds'] = seconds
+		return stats
+
+	def test_rate_without_replaced(self):
+		# abgebrochene versuche zählen nicht zur rate der erzeugten sudokus
+		stats = GeneratorStats()
+		stats.record('easy', self._stats(1.0))
+		stats.record('easy', self._stats(1.0))
+		stats.record('easy', self._stats(5.0), replaced=True)
+		snapshot = stats.snapshot()
+		self.assertEqual(snapshot['puzzles'], 2)
+		self.assertEqual(snapshot['seconds'], 2.0)
+		self.assertEqual(snapshot['puzzles_per_second'], 1.0)
+		self.assertEqual(snapshot['replaced'], 1)
+		self.assertEqual(snapshot['replaced_seconds'], 5.0)
+		easy = snapshot['difficulties']['easy']
+		self.assertEqual(easy['puzzles_per_second'], 1.0)
+		self.assertEqual(easy['max_seconds'], 1.0)
+
+if __name__ == '__main__':
+	unittest.main()
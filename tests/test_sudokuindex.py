@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+appDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(appDir, 'lib'))
+# für main.py
+sys.path.insert(0, appDir)
+
+from sudokufiller import MySudoku
+from sudokuindex import PublishedIndex
+import main
+
+class _Main(object):
+	'''Ersatz für main.Main ohne Tk-Fenster'''
+	def __init__(self, index):
+		self.index = index
+
+class PublishedIndexTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.filename = os.path.join(self.directory, 'published.idx')
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_empty_index_records_published(self):
+		# ein leerer index hat len() 0, darf aber nicht wie "kein index" behandelt werden
+		index = PublishedIndex(self.filename)
+		self.assertEqual(len(index), 0)
+		self.assertTrue(index is not None)
+
+		s = MySudoku('easy', seed=1)
+		self.assertFalse(s in index)
+		self.assertTrue(index.add(s))
+		index.flush()
+		index.close()
+
+		index = PublishedIndex(self.filename)
+		self.assertEqual(len(index), 1)
+		self.assertTrue(s in index)
+		# varianten sind dasselbe sudoku
+		self.assertTrue(s.variant(seed=2) in index)
+		self.assertFalse(MySudoku('easy', seed=3) in index)
+		index.close()
+
+	def test_main_publish_with_empty_index(self):
+		# wie main.Main.save_odt nach dem speichern des dokuments
+		app = _Main(PublishedIndex(self.filename))
+		s = MySudoku('normal', seed=4)
+		main.Main.publish.im_func(app, [s])
+		app.index.close()
+
+		index = PublishedIndex(self.filename)
+		self.assertTrue(s in index)
+		index.close()
+
+	def test_grow_keeps_keys(self):
+		index = PublishedIndex(self.filename)
+		keys = range(1, 2000)
+		for key in keys:
+			self.assertTrue(index.add_key(key))
+		index.close()
+
+		index = PublishedIndex(self.filename)
+		self.assertEqual(len(index), len(keys))
+		for key in keys:
+			self.assertTrue(index.contains_key(key))
+		self.assertFalse(index.contains_key(5000))
+		index.close()
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lib'))
+
+from sudokufiller import MySudoku
+import sudokupool
+from sudokupool import SudokuPool
+
+class SudokuPoolTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.sudokus = [MySudoku('easy', seed=n) for n in xrange(3)]
+		# das lesen der verzeichnisse zählen
+		self.listdirs = 0
+		self._listdir = sudokupool._listdir
+		def listdir(path):
+			self.listdirs += 1
+			return self._listdir(path)
+		sudokupool._listdir = listdir
+
+	def tearDown(self):
+		sudokupool._listdir = self._listdir
+		shutil.rmtree(self.directory)
+
+	def _claim(self, pool, s, pid):
+		'''Benennt ein Sudoku um wie take im Prozess pid'''
+		path = os.path.join(pool._bucket(s.difficulty), s.hash + sudokupool.SUFFIX)
+		claimed = '%s.%d%s' % (path, pid, sudokupool.CLAIMED)
+		os.rename(path, claimed)
+		return claimed
+
+	def test_take_without_listdir(self):
+		# was add abgelegt hat, wird ohne lesen des verzeichnisses entnommen
+		pool = SudokuPool(self.directory)
+		for s in self.sudokus:
+			pool.add(s)
+		self.listdirs = 0
+		taken = [pool.take('easy').hash for s in self.sudokus]
+		self.assertEqual(taken, [s.hash for s in self.sudokus])
+		self.assertEqual(self.listdirs, 0)
+		# leer: das verzeichnis wird einmal gelesen
+		self.assertTrue(pool.take('easy') is None)
+		self.assertEqual(self.listdirs, 1)
+
+	def test_take_from_other_pool(self):
+		# sudokus eines anderen prozesses findet erst das lesen des verzeichnisses
+		other = SudokuPool(self.directory)
+		pool = SudokuPool(self.directory)
+		for s in self.sudokus:
+			other.add(s)
+		hashes = sorted([pool.take('easy').hash for s in self.sudokus])
+		self.assertEqual(hashes, sorted([s.hash for s in self.sudokus]))
+		# die namen in der warteschlange von other sind schon entnommen
+		self.assertTrue(other.take('easy') is None)
+		self.assertEqual(pool.count('easy'), 0)
+
+	def test_restore_claimed_of_dead_process(self):
+		# ein abgestürzter prozess hat das sudoku umbenannt aber nicht gelöscht
+		other = SudokuPool(self.directory)
+		other.add(self.sudokus[0])
+		process = subprocess.Popen([sys.executable, '-c', 'pass'])
+		process.wait()
+		claimed = self._claim(other, self.sudokus[0], process.pid)
+
+		pool = SudokuPool(self.directory)
+		s = pool.take('easy')
+		self.assertEqual(s.hash, self.sudokus[0].hash)
+		self.assertFalse(os.path.exists(claimed))
+		self.assertEqual(os.listdir(pool._bucket('easy')), [])
+
+	def test_keep_claimed_of_running_process(self):
+		other = SudokuPool(self.directory)
+		other.add(self.sudokus[0])
+		claimed = self._claim(other, self.sudokus[0], os.getpid())
+
+		pool = SudokuPool(self.directory)
+		self.assertTrue(pool.take('easy') is None)
+		self.assertTrue(os.path.exists(claimed))
+
+if __name__ == '__main__':
+	unittest.main()